@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Локальное хранилище картинок каталога.
+
+Картинки один раз скачиваются (или импортируются из папки) в static/img,
+ужимаются до печатного размера и дальше берутся с диска — рендер PDF
+не ждёт сеть и работает без неё.
+
+    python assets.py sync tmp/m.json      # скачать картинки, упомянутые в каталоге
+    python assets.py import путь/к/папке  # забрать картинки из локальной папки
+"""
+
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+try:
+    from PIL import Image
+except ImportError:  # без Pillow картинки сохраняются как есть
+    Image = None
+
+REMOTE_PREFIX = "https://raw.githubusercontent.com/FFF2115/ga56d7806abs7d/refs/heads/main/"
+ASSET_DIR = Path("static/img")
+MAX_PX = 600          # длинная сторона: картинка в шапке не выше 200px, берём запас под печать
+JPEG_QUALITY = 85
+FETCH_TIMEOUT = 10    # секунд на одну картинку
+FETCH_BUDGET = 30     # секунд на докачку всех картинок задачи; остальные считаются отсутствующими
+RETRY_AFTER = 3600    # после неудачной загрузки не пробуем снова столько секунд
+
+_failed: Dict[str, float] = {}  # {имя: время неудачной загрузки}
+
+
+def local_path(name: str) -> Path:
+    # только имя файла — без выхода за пределы ASSET_DIR
+    return ASSET_DIR / Path(name).name
+
+
+def is_local(name: str) -> bool:
+    return local_path(name).exists()
+
+
+def image_src(name: str) -> str:
+    """
+    Адрес картинки для HTML: локальная копия (относительно <base> шаблона — static/)
+    или, если её нет, исходный адрес на GitHub.
+    """
+    if is_local(name):
+        return f"{ASSET_DIR.name}/{Path(name).name}"
+    return REMOTE_PREFIX + name
+
+
+def optimize(data: bytes) -> bytes:
+    """Уменьшает картинку до MAX_PX по длинной стороне и пережимает."""
+    if Image is None:
+        return data
+    with Image.open(io.BytesIO(data)) as img:
+        fmt = img.format
+        # GIF может быть анимированным — не трогаем
+        if fmt not in ("JPEG", "PNG") or (fmt == "PNG" and max(img.size) <= MAX_PX):
+            return data
+        img.thumbnail((MAX_PX, MAX_PX))
+        out = io.BytesIO()
+        if fmt == "JPEG":
+            img.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        else:
+            img.save(out, fmt, optimize=True)
+    result = out.getvalue()
+    return result if len(result) < len(data) else data
+
+
+def _save(name: str, data: bytes) -> Path:
+    ASSET_DIR.mkdir(parents=True, exist_ok=True)
+    path = local_path(name)
+    # пишем во временный файл: параллельная задача не должна принять недописанный файл за готовый
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+    tmp.write_bytes(optimize(data))
+    tmp.replace(path)
+    return path
+
+
+def fetch(name: str) -> Path:
+    """Скачивает картинку из REMOTE_PREFIX в локальное хранилище."""
+    with urllib.request.urlopen(REMOTE_PREFIX + name, timeout=FETCH_TIMEOUT) as resp:
+        return _save(name, resp.read())
+
+
+def import_dir(src_dir: str) -> List[Path]:
+    """Импортирует все картинки из локальной папки."""
+    saved = []
+    for p in sorted(Path(src_dir).iterdir()):
+        if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".gif"):
+            saved.append(_save(p.name, p.read_bytes()))
+    return saved
+
+
+def referenced_images(data: Iterable[Dict[str, Any]]) -> List[str]:
+    """Имена картинок, упомянутых в блоках каталога (без повторов, в порядке появления)."""
+    names: Dict[str, None] = {}
+    for item in data:
+        for img in item.get("images") or []:
+            names[img] = None
+    return list(names)
+
+
+def preflight(data: Iterable[Dict[str, Any]], fetch_missing: bool = False,
+              budget: float = FETCH_BUDGET) -> List[str]:
+    """
+    Проверка перед рендером: какие картинки каталога отсутствуют локально.
+    С fetch_missing=True отсутствующие сначала пробуем скачать, но не дольше budget секунд.
+    """
+    missing = []
+    deadline = time.monotonic() + budget
+    for name in referenced_images(data):
+        if is_local(name):
+            continue
+        if (fetch_missing and time.monotonic() < deadline
+                and time.time() - _failed.get(name, 0) > RETRY_AFTER):
+            try:
+                fetch(name)
+                continue
+            except Exception as e:
+                _failed[name] = time.time()
+                print(f"⚠️ Не удалось скачать {name}: {e}")
+        missing.append(name)
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальное хранилище картинок каталога")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="скачать картинки, упомянутые в JSON каталога")
+    sync.add_argument("catalog_json")
+    imp = sub.add_parser("import", help="импортировать картинки из папки")
+    imp.add_argument("directory")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        saved = import_dir(args.directory)
+        print(f"Импортировано картинок: {len(saved)}")
+        return
+
+    data = json.loads(Path(args.catalog_json).read_text(encoding="utf-8"))
+    missing = preflight(data, fetch_missing=True)
+    if missing:
+        print("Не найдены картинки: " + ", ".join(missing))
+        sys.exit(1)
+    print(f"Все картинки на месте: {ASSET_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение потокового парсера Excel с прежним (полная загрузка книги).
+
+Запуск из корня проекта:
+    python benchmarks/bench_excel_parser.py [файл.xlsx] [повторов]
+"""
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import excel2json  # noqa: E402
+
+
+def measure(xlsx: str, streaming: bool, repeats: int):
+    """Лучшее время из repeats прогонов и пик памяти отдельного прогона."""
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = excel2json.parse_excel_to_json(xlsx, streaming=streaming)
+        best = min(best, time.perf_counter() - t0)
+
+    # tracemalloc замедляет работу, поэтому память меряем отдельно
+    tracemalloc.start()
+    excel2json.parse_excel_to_json(xlsx, streaming=streaming)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    xlsx = sys.argv[1] if len(sys.argv) > 1 else "static/m4.xlsx"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    full_t, full_mem, full_res = measure(xlsx, streaming=False, repeats=repeats)
+    stream_t, stream_mem, stream_res = measure(xlsx, streaming=True, repeats=repeats)
+
+    if full_res != stream_res:
+        print("⚠️ Результаты парсеров различаются!")
+
+    rows = sum(len(b["rows"]) for b in stream_res)
+    print(f"Файл: {xlsx}, блоков: {len(stream_res)}, строк таблиц: {rows}")
+    print(f"{'режим':<12}{'время, с':>12}{'пик памяти, МБ':>18}")
+    print(f"{'полный':<12}{full_t:>12.4f}{full_mem / 2**20:>18.2f}")
+    print(f"{'потоковый':<12}{stream_t:>12.4f}{stream_mem / 2**20:>18.2f}")
+    print(f"Ускорение: ×{full_t / stream_t:.2f}, память: ×{full_mem / max(stream_mem, 1):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк конвейера на синтетических книгах разного размера.
+
+Для каждого размера (блоков приборов) меряет этапы
+parse_excel_to_json → convert → build_sections_from_json → PDF
+и печатает лучшее время, пропускную способность и пик памяти
+(память — в отдельном прогоне: tracemalloc искажает время).
+
+Запуск из корня проекта:
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000 10000] [--pdf-max 1000] [--repeats 3]
+    python benchmarks/bench_pipeline.py --json tmp/bench/result.json   # для сравнения прогонов
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import excel2json  # noqa: E402
+import json2html  # noqa: E402
+from synth_workbook import make_workbook  # noqa: E402
+
+BENCH_DIR = Path("tmp/bench")
+
+
+def timed(fn, *args, repeats: int = 1):
+    """(результат, лучшее время из repeats прогонов в секундах, пик памяти Python в байтах)."""
+    elapsed = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = min(elapsed, time.perf_counter() - t0)
+    # tracemalloc замедляет работу, поэтому память меряем отдельно
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def render_pdf(page: str, out_pdf: str):
+    import html2pdf
+    return html2pdf.process_html(page, out_pdf, wait_until="load")
+
+
+def bench(blocks: int, with_pdf: bool, repeats: int) -> dict:
+    xlsx = BENCH_DIR / f"synth_{blocks}.xlsx"
+    if not xlsx.exists():
+        make_workbook(blocks, str(xlsx))
+
+    raw, t_parse, m_parse = timed(excel2json.parse_excel_to_json, str(xlsx), repeats=repeats)
+    data, t_convert, m_convert = timed(excel2json.convert, raw, repeats=repeats)
+    sections, t_html, m_html = timed(json2html.build_sections_from_json, data, repeats=repeats)
+    rows = sum(len(item["data"]) for item in data)
+    stages = {
+        "parse_excel_to_json": (t_parse, m_parse),
+        "convert": (t_convert, m_convert),
+        "build_sections_from_json": (t_html, m_html),
+    }
+    if with_pdf:
+        # память Chromium tracemalloc не видит — здесь только сторона Python;
+        # рендер долгий, поэтому время — по одному прогону
+        page = json2html.wrap_page(sections)
+        _, t_pdf, m_pdf = timed(render_pdf, page, str(BENCH_DIR / f"synth_{blocks}.pdf"))
+        stages["pdf"] = (t_pdf, m_pdf)
+
+    return {
+        "blocks": len(data),
+        "rows": rows,
+        "html_bytes": len(sections.encode("utf-8")),
+        "stages": {name: {"seconds": round(t, 4),
+                          "rows_per_s": round(rows / t) if t else None,
+                          "peak_mb": round(m / 2**20, 2)}
+                   for name, (t, m) in stages.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера на синтетических книгах")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="сколько блоков приборов в книгах")
+    parser.add_argument("--pdf-max", type=int, default=1000,
+                        help="этап PDF меряем только для книг не больше стольких блоков (0 — не меряем)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="сколько прогонов этапов на Python; берётся лучшее время")
+    parser.add_argument("--json", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    results = []
+    print(f"{'блоков':>7}{'строк':>8}  {'этап':<26}{'время, с':>10}{'строк/с':>10}{'пик, МБ':>9}")
+    for blocks in args.sizes:
+        res = bench(blocks, with_pdf=blocks <= args.pdf_max, repeats=args.repeats)
+        results.append(res)
+        for name, st in res["stages"].items():
+            print(f"{blocks:>7}{res['rows']:>8}  {name:<26}{st['seconds']:>10.4f}"
+                  f"{st['rows_per_s'] or 0:>10}{st['peak_mb']:>9.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Сохранено: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
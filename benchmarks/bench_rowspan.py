@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк расчёта rowspan в json2html: прежний алгоритм
+(вложенные while по каждому столбцу) против обоих путей rowspan_spans —
+простого цикла и RLE по соседним значениям. По этим цифрам выбран
+json2html.SMALL_TABLE: с какой длины таблицы включается RLE.
+
+Запуск из корня проекта:
+    python benchmarks/bench_rowspan.py [повторов]
+"""
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import json2html  # noqa: E402
+
+COLUMNS = json2html.ALLOWED_COLUMNS
+
+
+def legacy_rowspan(data, columns):
+    """Прежняя реализация из generate_html_table — для сравнения."""
+    n = len(data)
+    rowspan_map = {col: [1] * n for col in columns}
+    for col in columns:
+        i = 0
+        while i < n:
+            j = i + 1
+            vi = data[i].get(col)
+            while j < n and data[j].get(col) == vi:
+                rowspan_map[col][i] += 1
+                rowspan_map[col][j] = 0
+                j += 1
+            i = j
+    return rowspan_map
+
+
+def make_table(rows: int, run: int, seed: int = 0):
+    """rows строк; значения столбцов повторяются сериями длиной до run."""
+    rnd = random.Random(seed)
+    data = []
+    current = {}
+    for i in range(rows):
+        for col in COLUMNS:
+            if col not in current or rnd.randrange(run) == 0:
+                value = f"{col} {rnd.randrange(1000)}"
+                # «Пределы давления» в JSON — список строк
+                current[col] = [value, value + " МПа"] if col == "Пределы давления" else value
+        data.append({col: (list(v) if isinstance(v, list) else v) for col, v in current.items()})
+    return data
+
+
+def check(data):
+    old = legacy_rowspan(data, COLUMNS)
+    new = json2html.rowspan_spans(data, COLUMNS)
+    m = len(COLUMNS)
+    for c, col in enumerate(COLUMNS):
+        for r in range(len(data)):
+            assert new[r * m + c] == old[col][r], (col, r)
+
+
+def path_time(data, small_table, repeats):
+    """Время rowspan_spans при заданном SMALL_TABLE: 0 — всегда RLE, больше строк — всегда цикл."""
+    saved, json2html.SMALL_TABLE = json2html.SMALL_TABLE, small_table
+    try:
+        return min(timeit.repeat(lambda: json2html.rowspan_spans(data, COLUMNS), number=1, repeat=repeats))
+    finally:
+        json2html.SMALL_TABLE = saved
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'строк':>8}{'серия':>8}{'прежний, мс':>14}{'цикл, мс':>12}{'RLE, мс':>12}{'ускорение':>12}")
+    for rows, run in [(5, 2), (50, 3), (100, 3), (1000, 10), (1000, 500), (2000, 10), (2000, 50),
+                      (5000, 10), (5000, 50), (10000, 500), (10000, 1)]:
+        data = make_table(rows, run)
+        check(data)
+        old_t = min(timeit.repeat(lambda: legacy_rowspan(data, COLUMNS), number=1, repeat=repeats))
+        loop_t = path_time(data, rows + 1, repeats)
+        rle_t = path_time(data, 0, repeats)
+        new_t = rle_t if rows >= json2html.SMALL_TABLE else loop_t  # путь, который выберет rowspan_spans
+        print(f"{rows:>8}{run:>8}{old_t * 1000:>14.2f}{loop_t * 1000:>12.2f}{rle_t * 1000:>12.2f}"
+              f"{old_t / new_t:>11.2f}×")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Генератор синтетических книг в формате static/m4.xlsx.
+
+Блок прибора: строка заголовка, строка описания, строка шапки,
+строки таблицы (10 колонок, часть ячеек пустая — их заполняет парсер
+из строки выше), строка с картинками и пустые строки-разделители.
+
+Запуск из корня проекта:
+    python benchmarks/synth_workbook.py блоков [файл.xlsx]
+"""
+
+import random
+import sys
+from pathlib import Path
+
+from openpyxl import Workbook
+
+HEADER = ["Модель", "Диаметр", "Класс точности", "Степень IP", "Резьба", "Климат",
+          "Вибро защита", "Пределы давления", "Температура измеряемой среды",
+          "Температура окружающей среды"]
+
+DEVICES = ["МАНОМЕТРЫ ТЕХНИЧЕСКИЕ", "ВАКУУММЕТРЫ", "МАНОВАКУУММЕТРЫ", "НАПОРОМЕРЫ",
+           "ТЯГОМЕРЫ", "МАНОМЕТРЫ ЭЛЕКТРОКОНТАКТНЫЕ", "ТЕРМОМАНОМЕТРЫ"]
+DIAMETERS = [40, 50, 63, 100, 160]
+ACCURACY = ["2,5", "1,5", "1,0", "0,6"]
+IP = ["IP40", "IP42", "IP43", "IP54", "IP65"]
+THREADS = ["M10×1", "M12×1,5", "M20×1,5", "G1/8", "G1/4", "G1/2"]
+CLIMATE = ["У2", "У1", "У3", "ОМ1", "ОМ2", "Т3"]
+VIBRO = ["L3", "L1", "L2", "V1-2"]
+LIMITS = ["0,1; 0,16; 0,25", "0,6; 1; 1,6", "2,5; 4; 6", "10; 16; 25"]
+
+
+def _options(rng: random.Random, values: list, sep: str = "; ") -> str:
+    """Основное значение и пара опций с пометкой ¹, как в исходной книге."""
+    main, *opts = rng.sample(values, 1 + rng.randint(0, 2))
+    return sep.join([main, *(f"{v}¹" for v in opts)])
+
+
+def _base_options(rng: random.Random, values: list) -> str:
+    """«база (опция; опция)» — формат колонок Климат и Вибро защита."""
+    main, *opts = rng.sample(values, 1 + rng.randint(0, 2))
+    return f"{main} ({'; '.join(opts)})" if opts else main
+
+
+def table_row(rng: random.Random, n: int) -> list:
+    return [
+        f"ДМ{n}.{rng.randint(10, 99)} Р; Тц\nкорпус - окрашенная сталь\nштуцер - медный сплав",
+        f"d.{rng.choice(DIAMETERS)}",
+        "к.т. " + _options(rng, ACCURACY),
+        _options(rng, IP),
+        _options(rng, THREADS),
+        _base_options(rng, CLIMATE),
+        _base_options(rng, VIBRO),
+        f"0 – {rng.choice(LIMITS)} МПа;\n-0,1 – 0 МПа;",
+        "от -70 до +150\n(+250) *",
+        "от -70 до +70",
+    ]
+
+
+def block_rows(rng: random.Random, n: int) -> list:
+    """Строки одного блока прибора (без разделителей)."""
+    rows = [
+        [f"{rng.choice(DEVICES)} {n}"],
+        [f"Предназначены для измерения давления, блок {n}. "
+         "Не агрессивные по отношению к медным сплавам среды."],
+        HEADER,
+    ]
+    prev = None
+    for _ in range(rng.randint(2, 12)):
+        row = table_row(rng, n)
+        if prev is not None:
+            # повторы соседних значений: парсер заполнит пустые ячейки, json2html — объединит
+            row = [("" if rng.random() < 0.4 and i else v) for i, v in enumerate(row)]
+        rows.append(row)
+        prev = row
+    if rng.random() < 0.7:
+        images = ", ".join(f"img{n}_{k}.{rng.choice(['jpg', 'png'])}" for k in range(rng.randint(1, 3)))
+        rows.append([f"Изображения: {images}"])
+    return rows
+
+
+def make_workbook(blocks: int, path: str, seed: int = 0) -> Path:
+    """Пишет книгу из blocks блоков приборов (write_only — годится и для 10 000 блоков)."""
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Каталог")
+    for n in range(blocks):
+        for row in block_rows(rng, n):
+            ws.append(row)
+        # один-три пустых разделителя, как в исходной книге
+        for _ in range(rng.randint(1, 3)):
+            ws.append([])
+    # редкий блок «по заказу» convert пропускает
+    ws.append(["Приборы по заказу"])
+    ws.append(["Изготавливаются по требованию заказчика."])
+    ws.append(HEADER)
+    ws.append(table_row(rng, blocks))
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(out)
+    return out
+
+
+def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    path = sys.argv[2] if len(sys.argv) > 2 else f"tmp/bench/synth_{blocks}.xlsx"
+    print(f"Сохранено: {make_workbook(blocks, path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,55 @@
-from flask import Flask, request, send_file, jsonify, send_from_directory
-import os, threading, uuid
-import excel2json, json2html, html2pdf
+from flask import Flask, Response, request, send_file, jsonify, send_from_directory, stream_with_context
+import io, json, os, shutil, threading, time, uuid
+import html2pdf, jobs, pipeline, upload_check
+from result_cache import get_cache
+from scheduler import JobScheduler, QueueFull
+from task_store import get_store
 
 app = Flask(__name__)
+# больше лимита проверки с запасом на multipart: огромное тело отбивается (413), не читаясь в память
+app.config['MAX_CONTENT_LENGTH'] = upload_check.MAX_UPLOAD_BYTES + 2**20
 
-tasks = {}  # словарь {task_id: {"status": "pending"|"processing"|"done"|"error"}}
+_task_changed = threading.Condition()
 
-def process_file(task_id, filename):
-    try:
-        tasks[task_id]['status'] = 'processing'
-        in_xlsx = os.path.join("tmp", filename)
-        excel2json.process(in_xlsx, f'tmp/{task_id}.json')
-        json2html.process(f'tmp/{task_id}.json', f'tmp/{task_id}.html')
-        html2pdf.process(f'tmp/{task_id}.html', f'tmp/{task_id}.pdf')
-        tasks[task_id]['status'] = 'done'
-    except Exception as e:
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['error'] = str(e)
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    # создаём лениво: дочерние spawn-процессы импортируют этот модуль заново
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
+
+
+class ThreadRunner(jobs.Runner):
+    """Этапы — в пулах JobScheduler, рендер — в пуле браузеров html2pdf."""
+
+    def run_stage(self, stage, fn, *args, in_process=True):
+        return get_scheduler().run_stage(stage, fn, *args, in_process=in_process)
+
+    def render_pdf(self, page, out_pdf, local_only, parts, on_stage):
+        return get_scheduler().run_stage('pdf', pipeline.render_pdf, page, out_pdf, html2pdf.get_pool(),
+                                         local_only, parts, on_stage, in_process=False)
+
+    def finish_native(self, catalog_pdf, out_pdf, on_stage):
+        return pipeline.finish_native(catalog_pdf, out_pdf, html2pdf.get_pool(), on_stage)
+
+    def notify(self):
+        with _task_changed:
+            _task_changed.notify_all()
+
+
+def process_file(task_id, cache_key, backend=pipeline.DEFAULT_BACKEND):
+    wait_time = get_scheduler().info(task_id).get('wait_time')
+    jobs.process_file(ThreadRunner(), task_id, cache_key, backend, wait_time)
+
+
+def _reply(response):
+    body, status = response
+    return jsonify(body), status
 
 
 @app.route('/tompribor_generator/api/upload', methods=['POST'])
@@ -28,33 +61,101 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'Имя файла пустое'}), 400
 
+    backend = request.form.get('backend', pipeline.DEFAULT_BACKEND)
+    if backend not in pipeline.BACKENDS:
+        return jsonify({'error': f'Неизвестный движок рендера: {backend}'}), 400
+
+    content = file.read()
+    # дешёвая проверка до очереди: книга с ошибками не занимает ни процесс, ни браузер
+    report = upload_check.check_upload(io.BytesIO(content), file.filename, len(content))
+    if not report['valid']:
+        return _reply(jobs.rejected(report))
+
+    cache_key = get_cache().key(content, backend)
     task_id = str(uuid.uuid4())
-    tasks[task_id] = {'status': 'pending'}
+    ws = jobs.workspace(task_id)
+    os.makedirs(ws)
+    if cached := jobs.from_cache(task_id, cache_key, report):
+        return _reply(cached)
+
+    scheduler = get_scheduler()
+    if scheduler.depth() >= scheduler.max_queue:
+        shutil.rmtree(ws)
+        return _reply(jobs.queue_full(scheduler.depth()))
 
-    filepath = os.path.join("tmp", f"{task_id}_{file.filename}")
-    file.save(filepath)
+    store = get_store()
+    store.create(task_id, ws)
+    with open(os.path.join(ws, 'input.xlsx'), 'wb') as f:
+        f.write(content)
 
-    threading.Thread(target=process_file, args=(task_id, f"{task_id}_{file.filename}")).start()
+    try:
+        position = scheduler.submit(task_id, process_file, cache_key, backend)
+    except QueueFull:
+        store.update(task_id, status='error', error='Очередь заполнена')
+        shutil.rmtree(ws)
+        return _reply(jobs.queue_full(scheduler.depth()))
 
-    return jsonify({'task_id': task_id}), 200
+    return _reply(jobs.accepted(task_id, position, report))
 
 
 @app.route('/tompribor_generator/api/status/<task_id>', methods=['GET'])
 def check_status(task_id):
-    task = tasks.get(task_id)
+    task = get_store().get(task_id)
     if not task:
         return jsonify({'error': 'Задача не найдена'}), 404
-    return jsonify(task)
+    return jsonify({**task, **get_scheduler().info(task_id)})
+
+
+@app.route('/tompribor_generator/api/events/<task_id>', methods=['GET'])
+def task_events(task_id):
+    """
+    Server-Sent Events: состояние задачи отправляется при каждом изменении
+    (этап, прогресс), поток закрывается после done/error.
+    Пока задача в очереди, состояние с позицией шлётся и по таймауту.
+    """
+    store = get_store()
+    if store.get(task_id) is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+
+    def stream():
+        seen = -1
+        while True:
+            deadline = time.monotonic() + jobs.EVENTS_KEEPALIVE
+            with _task_changed:
+                while (version := store.version(task_id)) == seen and time.monotonic() < deadline:
+                    _task_changed.wait(timeout=jobs.EVENTS_POLL)
+            task = store.get(task_id)
+            if task is None:
+                return
+            if version == seen and task['status'] != 'pending':
+                yield ': keep-alive\n\n'
+                continue
+            seen = version
+            yield f'data: {json.dumps({**task, **get_scheduler().info(task_id)}, ensure_ascii=False)}\n\n'
+            if task['status'] in ('done', 'error'):
+                return
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 
 @app.route('/tompribor_generator/api/download/<task_id>', methods=['GET'])
 def download_file(task_id):
-    file_path = f'tmp/{task_id}.pdf'
-    if os.path.exists(file_path):
+    store = get_store()
+    if store.get(task_id) is None:
+        return jsonify({'error': 'Задача не найдена'}), 404
+    file_path = store.pdf_path(task_id)
+    if file_path:
         return send_file(file_path, as_attachment=True)
     return jsonify({'error': 'Файл не готов'}), 404
 
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Метрики этого процесса в формате Prometheus."""
+    return Response(jobs.render_metrics(get_scheduler().depth()), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/tompribor_generator/api/instruction', methods=['GET'])
 def get_instruction():
     return send_file('static/instruction.pdf', as_attachment=True)
@@ -68,4 +169,7 @@ def home():
     return "404 Not Found", 404
 
 if __name__ == '__main__':
+    html2pdf.get_pool()  # браузеры стартуют до первого запроса
+    get_scheduler()
+    jobs.startup()
     app.run(debug=False, host='0.0.0.0', port=61236)
\ No newline at end of file
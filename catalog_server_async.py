@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный вариант catalog_server на aiohttp и playwright.async_api.
+
+Те же маршруты, тот же формат ответов и тот же ход задачи (jobs.process_file),
+но запросы — корутины: все задачи рендерят страницами одного общего браузера
+(AsyncRenderer) в event loop, загрузка пишется на диск кусками по мере приёма,
+PDF отдаётся через sendfile. Сама задача идёт в своём потоке, их не больше WORKERS.
+
+    python catalog_server_async.py
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import html2pdf
+import jobs
+import pipeline
+import upload_check
+from result_cache import get_cache
+from scheduler import (MAX_QUEUE, STAGE_TIMEOUTS, WORKERS, StageTimeout, process_pool,
+                       recycle_processes, wait_stage)
+from task_store import get_store
+
+MAX_PAGES = WORKERS * 2  # одновременно открытых страниц в общем браузере
+UPLOAD_CHUNK = 2**16     # размер куска при записи загрузки на диск
+MAX_BODY = upload_check.MAX_UPLOAD_BYTES + 2**20  # как MAX_CONTENT_LENGTH во Flask: запас на multipart
+
+# запросы к SQLite короткие, поэтому делаются прямо в event loop
+_waiting = []  # task_id в порядке очереди
+_queued_at = {}  # {task_id: время постановки в очередь}
+_task_changed = None  # asyncio.Condition, создаётся в on_startup внутри event loop
+_wakeups = set()  # задачи notify_all: loop держит на задачи лишь слабые ссылки
+_processes = None  # пул процессов этапов, создаётся в on_startup и меняется после таймаута
+_pool_lock = threading.Lock()  # смену _processes делают потоки задач
+
+routes = web.RouteTableDef()
+
+
+async def _notify_all():
+    async with _task_changed:
+        _task_changed.notify_all()
+
+
+def _wake():
+    task = asyncio.get_running_loop().create_task(_notify_all())
+    _wakeups.add(task)
+    task.add_done_callback(_wakeups.discard)
+
+
+def queue_info(task_id):
+    """Позиция в очереди и её глубина — как JobScheduler.info."""
+    info = {}
+    if task_id in _queued_at:
+        info['queue_depth'] = len(_waiting)
+    if task_id in _waiting:
+        info['queue_position'] = _waiting.index(task_id) + 1
+    return info
+
+
+class LoopRunner(jobs.Runner):
+    """
+    Исполнение задачи из её потока: этапы на Python — в пулах приложения,
+    рендер — корутинами на общем браузере в event loop.
+    """
+
+    def __init__(self, app, loop):
+        self.app = app
+        self.loop = loop
+
+    def run_stage(self, stage, fn, *args, in_process=True):
+        global _processes
+        executor = _processes if in_process else self.app['threads']
+        try:
+            return wait_stage(stage, executor.submit(fn, *args), STAGE_TIMEOUTS.get(stage))
+        except StageTimeout:
+            if in_process:
+                # как JobScheduler.run_stage: зависший процесс не должен держать слот пула
+                with _pool_lock:
+                    if _processes is executor:
+                        _processes = process_pool(WORKERS)
+                        recycle_processes(executor, grace=max(STAGE_TIMEOUTS.values()))
+            raise
+
+    def render_pdf(self, page, out_pdf, local_only, parts, on_stage):
+        render = pipeline.render_pdf_async(page, out_pdf, self.app['renderer'], local_only, parts, on_stage)
+        return wait_stage('pdf', asyncio.run_coroutine_threadsafe(render, self.loop), STAGE_TIMEOUTS.get('pdf'))
+
+    def finish_native(self, catalog_pdf, out_pdf, on_stage):
+        merge = pipeline.finish_native_async(catalog_pdf, out_pdf, self.app['renderer'], on_stage)
+        return asyncio.run_coroutine_threadsafe(merge, self.loop).result()
+
+    def notify(self):
+        # зовут и из потока задачи, и из корутин рендера (on_stage)
+        self.loop.call_soon_threadsafe(_wake)
+
+
+async def process_file(app, task_id, cache_key, backend=pipeline.DEFAULT_BACKEND):
+    async with app['workers']:
+        _waiting.remove(task_id)
+        wait_time = round(time.monotonic() - _queued_at.pop(task_id), 3)
+        runner = LoopRunner(app, asyncio.get_running_loop())
+        await asyncio.to_thread(jobs.process_file, runner, task_id, cache_key, backend, wait_time)
+
+
+def _reply(response):
+    body, status = response
+    return web.json_response(body, status=status)
+
+
+async def _save_upload(field, path):
+    """
+    Пишет файл из multipart на диск кусками и попутно хэширует его для ключа кэша.
+    Возвращает (хэш, размер) или None, если файл больше лимита upload_check:
+    тогда чтение обрывается, а недописанный файл удаляется.
+    """
+    h = get_cache().hasher()
+    size = 0
+    with open(path, 'wb') as f:
+        while chunk := await field.read_chunk(UPLOAD_CHUNK):
+            size += len(chunk)
+            if size > upload_check.MAX_UPLOAD_BYTES:
+                break
+            h.update(chunk)
+            f.write(chunk)
+    if size > upload_check.MAX_UPLOAD_BYTES:
+        os.remove(path)
+        return None
+    return h, size
+
+
+def _too_large(request):
+    # остаток тела не дочитываем: после ответа соединение закрывается без lingering-чтения
+    request.protocol.force_close()
+    return web.json_response({'error': f'Файл больше {upload_check.MAX_UPLOAD_BYTES} байт'}, status=413)
+
+
+@routes.post('/tompribor_generator/api/upload')
+async def upload_file(request):
+    task_id = str(uuid.uuid4())
+    ws = jobs.workspace(task_id)
+    in_xlsx = os.path.join(ws, 'input.xlsx')
+    backend = pipeline.DEFAULT_BACKEND
+    hasher = None
+    filename = size = None
+    if request.content_length is not None and request.content_length > MAX_BODY:
+        return _too_large(request)
+
+    # поля формы читаются по порядку; файл сразу пишется на диск
+    reader = await request.multipart()
+    while (field := await reader.next()) is not None:
+        if field.name == 'backend':
+            backend = await field.text()
+        elif field.name == 'file' and hasher is None:
+            if not field.filename:
+                return web.json_response({'error': 'Имя файла пустое'}, status=400)
+            os.makedirs(ws)
+            filename = field.filename
+            saved = await _save_upload(field, in_xlsx)
+            if saved is None:
+                shutil.rmtree(ws)
+                return _too_large(request)
+            hasher, size = saved
+    if hasher is None:
+        return web.json_response({'error': 'Файл не найден'}, status=400)
+    if backend not in pipeline.BACKENDS:
+        shutil.rmtree(ws)
+        return web.json_response({'error': f'Неизвестный движок рендера: {backend}'}, status=400)
+
+    # дешёвая проверка до очереди: книга с ошибками не занимает ни процесс, ни браузер
+    report = await asyncio.to_thread(upload_check.check_upload, in_xlsx, filename, size)
+    if not report['valid']:
+        shutil.rmtree(ws)
+        return _reply(jobs.rejected(report))
+
+    cache_key = get_cache().digest(hasher, backend)
+    if cached := await asyncio.to_thread(jobs.from_cache, task_id, cache_key, report):
+        return _reply(cached)
+
+    if len(_waiting) >= MAX_QUEUE:
+        shutil.rmtree(ws)
+        return _reply(jobs.queue_full(len(_waiting)))
+
+    get_store().create(task_id, ws)
+    _waiting.append(task_id)
+    _queued_at[task_id] = time.monotonic()
+    request.app['jobs'].add(task := asyncio.create_task(process_file(request.app, task_id, cache_key, backend)))
+    task.add_done_callback(request.app['jobs'].discard)
+    return _reply(jobs.accepted(task_id, len(_waiting), report))
+
+
+@routes.get('/tompribor_generator/api/status/{task_id}')
+async def check_status(request):
+    task_id = request.match_info['task_id']
+    task = get_store().get(task_id)
+    if not task:
+        return web.json_response({'error': 'Задача не найдена'}, status=404)
+    return web.json_response({**task, **queue_info(task_id)})
+
+
+@routes.get('/tompribor_generator/api/events/{task_id}')
+async def task_events(request):
+    """Server-Sent Events: состояние задачи при каждом изменении, до done/error."""
+    task_id = request.match_info['task_id']
+    store = get_store()
+    if store.get(task_id) is None:
+        return web.json_response({'error': 'Задача не найдена'}, status=404)
+
+    resp = web.StreamResponse(headers={'Content-Type': 'text/event-stream',
+                                       'Cache-Control': 'no-cache',
+                                       'X-Accel-Buffering': 'no'})
+    await resp.prepare(request)
+    seen = -1
+    loop = asyncio.get_running_loop()
+    while True:
+        deadline = loop.time() + jobs.EVENTS_KEEPALIVE
+        async with _task_changed:
+            while (version := store.version(task_id)) == seen and loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(_task_changed.wait(), jobs.EVENTS_POLL)
+                except asyncio.TimeoutError:
+                    pass
+        task = store.get(task_id)
+        if task is None:
+            return resp
+        if version == seen and task['status'] != 'pending':
+            await resp.write(b': keep-alive\n\n')
+            continue
+        seen = version
+        event = json.dumps({**task, **queue_info(task_id)}, ensure_ascii=False)
+        await resp.write(f'data: {event}\n\n'.encode())
+        if task['status'] in ('done', 'error'):
+            return resp
+
+
+@routes.get('/tompribor_generator/api/download/{task_id}')
+async def download_file(request):
+    task_id = request.match_info['task_id']
+    store = get_store()
+    if store.get(task_id) is None:
+        return web.json_response({'error': 'Задача не найдена'}, status=404)
+    file_path = store.pdf_path(task_id)
+    if file_path:
+        # FileResponse отдаёт файл через sendfile, без копирования в память процесса
+        return web.FileResponse(file_path, headers={
+            'Content-Disposition': 'attachment; filename="catalog.pdf"'})
+    return web.json_response({'error': 'Файл не готов'}, status=404)
+
+
+@routes.get('/metrics')
+async def get_metrics(request):
+    """Метрики этого процесса в формате Prometheus."""
+    return web.Response(text=jobs.render_metrics(len(_waiting)), content_type='text/plain', charset='utf-8')
+
+
+@routes.get('/tompribor_generator/api/instruction')
+async def get_instruction(request):
+    return web.FileResponse('static/instruction.pdf', headers={
+        'Content-Disposition': 'attachment; filename="instruction.pdf"'})
+
+
+@routes.get('/tompribor_generator')
+async def index(request):
+    return web.FileResponse('static/index.html')
+
+
+@routes.get('/')
+async def home(request):
+    return web.Response(text="404 Not Found", status=404)
+
+
+async def on_startup(app):
+    global _task_changed, _processes
+    _task_changed = asyncio.Condition()
+    app['workers'] = asyncio.Semaphore(WORKERS)
+    app['jobs'] = set()
+    _processes = process_pool(WORKERS)
+    app['threads'] = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="stage")
+    app['renderer'] = html2pdf.AsyncRenderer(max_pages=MAX_PAGES)
+    await app['renderer'].start()  # браузер стартует до первого запроса
+    jobs.startup()
+
+
+async def on_cleanup(app):
+    for task in list(app['jobs']):
+        task.cancel()
+    await app['renderer'].close()
+    _processes.shutdown(cancel_futures=True)
+    app['threads'].shutdown(cancel_futures=True)
+
+
+def create_app():
+    app = web.Application()
+    app.add_routes(routes)
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=61236)
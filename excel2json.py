@@ -5,12 +5,19 @@
 
 import json
 import re
+from xml.etree.ElementTree import iterparse
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from openpyxl import load_workbook
+from openpyxl.utils.cell import column_index_from_string
 from openpyxl.worksheet.worksheet import Worksheet
 
+try:  # внутренний парсер листа openpyxl; в другой версии его может не быть — тогда iter_rows
+    from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError:
+    WorkSheetParser = None
+
 
 def _cell_value(v: Any) -> str:
     """Нормализуем значение ячейки в строку."""
@@ -27,21 +34,205 @@ def _row_is_empty(ws: Worksheet, row_idx: int, max_cols: int = 8) -> bool:
     return True
 
 
-def _join_8(row_vals: List[str]) -> str:
-    """Собираем 8 значений в строку с кавычками и \t."""
-    safe = [v.replace('"', r'\"') for v in row_vals]
-    quoted = [f"\"{v}\"" for v in safe]
-    return "\t".join(quoted)
-
 MAX_COLS = 10
+MAX_GAP = 3  # пустых строк подряд, после которых автомат _parse_rows уже не меняет состояние
+
+
+def _iter_rows(ws, max_cols: int = MAX_COLS, typed: bool = True) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Потоково отдаём (номер строки, ячейки) только для строк, которые есть в XML листа.
+
+    ws.iter_rows read_only-листа дописывает пропущенные строки пустыми: после
+    отформатированной строки 1048576 (как в static/m4.xlsx) это миллион пустых
+    кортежей. Поэтому читаем XML листа напрямую, а пропуск между
+    строками заменяем не более чем MAX_GAP пустыми строками — разбору блоков
+    больше не нужно: две уходят на описание и шапку, третья закрывает таблицу.
+    typed=False — текст ячеек как он записан в XML (числа и даты без
+    преобразования, стили не читаются): втрое быстрее, хватает для проверок.
+    Если внутренностей openpyxl нет (другая версия), строки те же, но через
+    публичный ws.iter_rows — медленнее на таких листах.
+    """
+    if not _has_sheet_parser(ws):
+        yield from _iter_rows_public(ws, max_cols)
+        return
+
+    wb = ws.parent
+    empty = [""] * max_cols
+    last = 0
+    with ws._get_source() as src:
+        if typed:
+            parser = WorkSheetParser(src, ws._shared_strings, data_only=wb.data_only, epoch=wb.epoch,
+                                     date_formats=wb._date_formats, timedelta_formats=wb._timedelta_formats)
+            rows = ((idx, [(cell["column"], cell["value"]) for cell in cells])
+                    for idx, cells in parser.parse())
+        else:
+            rows = _iter_xml_rows(src, ws._shared_strings)
+        for idx, cells in rows:
+            for gap in range(max(last + 1, idx - MAX_GAP), idx):
+                yield gap, empty
+            last = idx
+            vals = [""] * max_cols
+            for column, value in cells:
+                if column <= max_cols:
+                    vals[column - 1] = _cell_value(value)
+            yield idx, vals
+
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_ROW, _CELL, _VALUE, _INLINE, _TEXT = (f"{_NS}{tag}" for tag in ("row", "c", "v", "is", "t"))
+
+
+def _iter_xml_rows(src, shared_strings: Sequence[str]) -> Iterator[Tuple[int, List[Tuple[int, str]]]]:
+    """(номер строки, [(колонка, текст)]) из XML листа: только общие строки разыменовываются."""
+    idx = 0
+    rows = None  # <sheetData>: обработанные строки из него удаляем, лист в памяти не копится
+    for event, el in iterparse(src, events=("start", "end")):
+        if event == "start":
+            if rows is None and el.tag == f"{_NS}sheetData":
+                rows = el
+            continue
+        if el.tag != _ROW:
+            continue
+        idx = int(el.get("r") or idx + 1)
+        cells = []
+        column = 0
+        for c in el.iter(_CELL):
+            ref = c.get("r")
+            column = column_index_from_string(ref.rstrip("0123456789")) if ref else column + 1
+            kind = c.get("t")
+            if kind == "inlineStr":
+                inline = c.find(_INLINE)
+                text = "".join(t.text or "" for t in inline.iter(_TEXT)) if inline is not None else ""
+            else:
+                v = c.find(_VALUE)
+                text = v.text if v is not None else None
+                if kind == "s" and text is not None:
+                    text = shared_strings[int(text)]
+            cells.append((column, text))
+        yield idx, cells
+        if rows is not None:
+            rows.clear()
+
+
+def _has_sheet_parser(ws) -> bool:
+    wb = ws.parent
+    return (WorkSheetParser is not None
+            and all(hasattr(ws, a) for a in ("_get_source", "_shared_strings"))
+            and all(hasattr(wb, a) for a in ("epoch", "_date_formats", "_timedelta_formats")))
+
+
+def _iter_rows_public(ws, max_cols: int) -> Iterator[Tuple[int, List[str]]]:
+    """То же, что _iter_rows, через публичный API: пустые строки читаются, но не отдаются сверх MAX_GAP."""
+    empty = [""] * max_cols
+    gap = 0
+    if hasattr(ws, "reset_dimensions"):
+        ws.reset_dimensions()  # размеры из файла бывают неверными — читаем до последней строки
+    for idx, raw in enumerate(ws.iter_rows(max_col=max_cols, values_only=True), start=1):
+        if all(v is None for v in raw):
+            gap += 1
+            continue
+        for skipped in range(idx - min(gap, MAX_GAP), idx):
+            yield skipped, empty
+        gap = 0
+        vals = [_cell_value(v) for v in raw]
+        vals.extend([""] * (max_cols - len(vals)))
+        yield idx, vals
+
+
+def _parse_rows(rows: Iterable[List[str]]) -> list:
+    """
+    Разбор блоков за один проход:
+    заголовок прибора → описание → строка шапки → строки таблицы до пустой строки.
+    Пустые ячейки таблицы заполняются значением из предыдущей строки.
+    """
+    results: List[Dict[str, Any]] = []
+
+    block: Optional[Dict[str, Any]] = None
+    skip = 0            # сколько строк после заголовка ещё не таблица (описание + шапка)
+    in_table = False
+    prev_vals: List[str] = []
+
+    for vals in rows:
+        if skip:
+            if skip == 2:
+                block["description"] = vals[0]
+            skip -= 1
+            continue
+
+        empty = not any(vals)
+
+        if in_table:
+            if empty:
+                # пустая строка закрывает таблицу
+                in_table = False
+                continue
+            # берём из предыдущей строки, если ячейка пустая
+            vals = [v or p for v, p in zip(vals, prev_vals)]
+            prev_vals = vals
+            block["rows"].append(vals)
+            continue
+
+        # Ищем заголовок прибора; строки без него (и разделители) пропускаем
+        if not empty and vals[0]:
+            block = {"device": vals[0], "description": "", "rows": []}
+            results.append(block)
+            skip = 2
+            in_table = True
+            prev_vals = [""] * MAX_COLS
+
+    return results
+
+
+SheetNames = Union[None, str, Sequence[str]]
+
+
+def _sheet_names(wb, sheet_name: SheetNames) -> List[str]:
+    """None — все листы книги по порядку, строка — один лист, список — выбранные."""
+    if sheet_name is None:
+        return [ws.title for ws in wb.worksheets]
+    if isinstance(sheet_name, str):
+        return [sheet_name]
+    return list(sheet_name)
+
+
+def _parse_sheet(ws) -> list:
+    return _parse_rows(vals for _, vals in _iter_rows(ws))
+
 
 def parse_excel_to_json(
     xlsx_path: Union[str, Path],
-    sheet_name: Optional[str] = None
+    sheet_name: SheetNames = None,
+    streaming: bool = True
+) -> list:
+    """
+    Разбирает листы книги (по умолчанию все) за одну загрузку; блоки листов
+    идут подряд в порядке листов.
+    streaming=True — потоковый режим (read_only, только строки из XML листа), каждая строка читается один раз.
+    streaming=False — прежний разбор с полной загрузкой книги (для сравнения).
+    """
+    if not streaming:
+        return _parse_excel_full(xlsx_path, sheet_name)
+
+    wb = load_workbook(filename=xlsx_path, read_only=True, data_only=True)
+    try:
+        # листы — по очереди: разбор упирается в GIL, потоки его не ускоряют
+        return [block for name in _sheet_names(wb, sheet_name) for block in _parse_sheet(wb[name])]
+    finally:
+        wb.close()
+
+
+def _parse_excel_full(
+    xlsx_path: Union[str, Path],
+    sheet_name: SheetNames = None
 ) -> list:
     wb = load_workbook(filename=xlsx_path, data_only=True)
-    ws = wb[sheet_name] if sheet_name else wb.active
+    results: List[Dict[str, Any]] = []
+    for name in _sheet_names(wb, sheet_name):
+        results.extend(_parse_sheet_full(wb[name]))
+    return results
+
 
+def _parse_sheet_full(ws: Worksheet) -> list:
     results: List[Dict[str, Any]] = []
 
     r = 1
@@ -60,7 +251,7 @@ def parse_excel_to_json(
 
             # Пропускаем 2 строки шапки
             start_table_row = r + 3
-            table_rows: List[str] = []
+            table_rows: List[List[str]] = []
 
             cur = start_table_row
             prev_vals: List[str] = [""] * MAX_COLS  # храним последние значения по колонкам
@@ -79,8 +270,7 @@ def parse_excel_to_json(
                         vals.append(cell_val)
 
                 prev_vals = vals[:]  # обновляем "последние значения"
-                line = _join_8(vals)
-                table_rows.append(line)
+                table_rows.append(vals)
 
                 cur += 1
 
@@ -105,143 +295,170 @@ def parse_excel_to_json(
     return results
 
 
-import re
+# ====== Парсеры колонок ======
+# Реестр: (индекс ячейки, имя колонки в JSON, парсер). Парсер получает текст ячейки
+# и возвращает значение колонки или None, если колонку в строку не добавляем.
+# Порядок реестра задаёт порядок ключей в итоговом JSON.
+
+ColumnParser = Callable[[str], Any]
+COLUMN_PARSERS: List[Tuple[int, str, ColumnParser]] = []
+
+
+def column_parser(index: int, name: str):
+    """Регистрирует парсер ячейки index под именем колонки name."""
+    def register(fn: ColumnParser) -> ColumnParser:
+        COLUMN_PARSERS.append((index, name, fn))
+        return fn
+    return register
+
+
+_RE_IMAGE = re.compile(r'\b[\w-]+\.(?:jpg|jpeg|png|gif)\b', re.IGNORECASE)
+_RE_DIAMETER = re.compile(r"d\.?(\d+)")
+_RE_KT_PREFIX = re.compile(r"к\.т\.\s*")
+_RE_IP = re.compile(r"IP\d+")
+_RE_THREAD_SEP = re.compile(r"[; ]+")
+_RE_PARENS = re.compile(r"[()]")
+_RE_CYRILLIC = re.compile(r"[А-Яа-яЁё]")
+_RE_VIBRO_OPTION = re.compile(r"\(([^)]*?)\)\s*([1¹])?")
+_RE_PRESSURE_UNIT = re.compile(r'([A-Za-zА-Яа-яЁё]+;)')
+
+
+def parse_images(s: str) -> List[str]:
+    """
+    Извлекает имена файлов изображений из строки.
+    Поддерживает расширения jpg|jpeg|png|gif.
+    """
+    return _RE_IMAGE.findall(s)
+
+
+def _with_optional(values: List[str]) -> str:
+    """Первое значение — основное, остальные помечаем как опции (¹)."""
+    formatted = values[:1] + [f"<span class='optional'>{v}¹</span>" for v in values[1:]]
+    return "<br>".join(formatted)
+
+
+def _base_and_options(raw: str) -> str:
+    """«база (опция; опция)» → база и опции через <br>."""
+    base, *opts = _RE_PARENS.split(raw)
+    values = [base.strip()]
+    if opts:
+        for opt in opts[0].split(";"):
+            opt = opt.strip().replace("¹", "")
+            if opt:
+                values.append(opt)
+    return _with_optional(values)
+
+
+@column_parser(0, "Модель")
+def _parse_model(raw: str) -> str:
+    model_raw = raw.strip()
+    if "\n" not in model_raw:
+        return model_raw
+
+    lines = [line.strip() for line in model_raw.split("\n") if line.strip()]
+    first, rest = lines[0], lines[1:]
+    formatted = [first]
+    for r in rest:
+        # считаем количество заглавных букв
+        upper_count = sum(1 for ch in r if ch.isupper())
+        if upper_count >= 2:
+            formatted.append(f"<br>{r}")
+        else:
+            formatted.append(f"<br><span class='table_subtext'>{r}</span>")
+    return "".join(formatted)
 
-def convert(data: list) -> list:
-    def parse_images(s: str) -> list[str]:
-        """
-        Извлекает имена файлов изображений из строки.
-        Поддерживает расширения jpg|jpeg|png|gif.
-        """
-        return re.findall(r'\b[\w-]+\.(?:jpg|jpeg|png|gif)\b', s, flags=re.IGNORECASE)
-    def parse_row(text: str) -> dict:
-        parts = [p.strip().strip('"') for p in text.split("\t") if p.strip()]
-
-        # Проверяем количество частей
-        required_parts = MAX_COLS  # у нас минимум до parts[9]
-        if len(parts) < required_parts:
-            raise ValueError(
-                f"Ошибка парсинга строки: ожидалось минимум {required_parts} частей, "
-                f"но получено {len(parts)}.\nСтрока: {text}"
-            )
 
-        row = {}
+@column_parser(1, "Диаметр")
+def _parse_diameter(raw: str) -> Optional[str]:
+    diameter_match = _RE_DIAMETER.search(raw)
+    if diameter_match:
+        return f"{diameter_match.group(1)} мм"
+    return None
 
-        # 1. Модель
-        model_raw = parts[0].strip()
-        if "\n" in model_raw:
-            lines = [line.strip() for line in model_raw.split("\n") if line.strip()]
-            first, rest = lines[0], lines[1:]
-            formatted = [first]
 
-            for r in rest:
-                # считаем количество заглавных букв
-                upper_count = sum(1 for ch in r if ch.isupper())
-                if upper_count >= 2:
-                    formatted.append(f"<br>{r}")
-                else:
-                    formatted.append(f"<br><span class='table_subtext'>{r}</span>")
+@column_parser(2, "Класс точности")
+def _parse_accuracy(raw: str) -> str:
+    kt_raw = _RE_KT_PREFIX.sub("", raw)
+    return _with_optional([v.strip().replace("¹", "") for v in kt_raw.split(";") if v.strip()])
 
-            row["Модель"] = "".join(formatted)
-        else:
-            row["Модель"] = model_raw
-
-        # 2. Диаметр
-        diameter_match = re.search(r"d\.?(\d+)", parts[1])
-        if diameter_match:
-            row["Диаметр"] = f"{diameter_match.group(1)} мм"
-
-        # 3. Класс точности
-        kt_raw = re.sub(r"к\.т\.\s*", "", parts[2])
-        kt_values = [v.strip().replace("¹", "") for v in re.split(r"[;]", kt_raw) if v.strip()]
-        kt_formatted = []
-        for i, val in enumerate(kt_values):
-            if i == 0:
-                kt_formatted.append(val)
-            else:
-                kt_formatted.append(f"<span class='optional'>{val}¹</span>")
-        row["Класс точности"] = "<br>".join(kt_formatted)
-
-        # 4. Степень IP
-        ip_values = re.findall(r"IP\d+", parts[3])
-        ip_formatted = []
-        for i, val in enumerate(ip_values):
-            if i == 0:
-                ip_formatted.append(val)
-            else:
-                ip_formatted.append(f"<span class='optional'>{val}¹</span>")
-        row["Степень IP"] = "<br>".join(ip_formatted)
-
-        # 5. Резьба
-        thread_values = re.split(r"[; ]+", parts[4].replace("¹", ""))
-        thread_values = [v for v in thread_values if v]
-        thread_formatted = []
-        for i, val in enumerate(thread_values):
-            if i == 0:
-                thread_formatted.append(val)
-            else:
-                thread_formatted.append(f"<span class='optional'>{val}¹</span>")
-        row["Резьба"] = "<br>".join(thread_formatted)
-
-        # 6. Климат
-        climate_raw = parts[5]
-        base, *opts = re.split(r"[()]", climate_raw)
-        climate_values = [base.strip()]
-        if opts:
-            for opt in opts[0].split(";"):
-                opt = opt.strip().replace("¹", "")
-                if opt:
-                    climate_values.append(f"<span class='optional'>{opt}¹</span>")
-        row["Климат"] = "<br>".join(climate_values)
-
-        # 7. Виброзащита
-        vibro_raw = parts[6]
-        if re.search(r"[А-Яа-яЁё]", vibro_raw):
-            # ищем содержимое в скобках и заменяем с ¹
-            def replacer(match):
-                opt = match.group(1)
-                suffix = "¹" if match.group(2) else ""
-                return f"<span class='optional'>({opt}){suffix}</span>"
-
-            # ( ... ) + опционально '1' или '¹'
-            result = re.sub(r"\(([^)]*?)\)\s*([1¹])?", replacer, vibro_raw)
-
-            row_value = result.strip()
-        else:
-            # старое поведение
-            base, *opts = re.split(r"[()]", vibro_raw)
-            vibro_values = [base.strip()]
-            if opts:
-                for opt in opts[0].split(";"):
-                    opt = opt.strip().replace("¹", "")
-                    if opt:
-                        vibro_values.append(f"<span class='optional'>{opt}¹</span>")
-            row_value = "<br>".join(vibro_values)
-
-        row["Вибро защита"] = row_value
-
-        # 8. Пределы давления
-        pressure_raw = parts[7]
-        pressure_lines = [line.strip() for line in pressure_raw.split("\n") if line.strip()]
-        result = []
-        for line in pressure_lines:
-            chunks = re.split(r'([A-Za-zА-Яа-яЁё]+;)', line)
-            buf = ""
-            for chunk in chunks:
-                buf += chunk
-                if re.fullmatch(r'[A-Za-zА-Яа-яЁё]+;', chunk):
-                    result.append(buf.strip())
-                    buf = ""
-            if buf.strip():
+
+@column_parser(3, "Степень IP")
+def _parse_ip(raw: str) -> str:
+    return _with_optional(_RE_IP.findall(raw))
+
+
+@column_parser(4, "Резьба")
+def _parse_thread(raw: str) -> str:
+    return _with_optional([v for v in _RE_THREAD_SEP.split(raw.replace("¹", "")) if v])
+
+
+@column_parser(5, "Климат")
+def _parse_climate(raw: str) -> str:
+    return _base_and_options(raw)
+
+
+def _vibro_option(match: "re.Match[str]") -> str:
+    opt = match.group(1)
+    suffix = "¹" if match.group(2) else ""
+    return f"<span class='optional'>({opt}){suffix}</span>"
+
+
+@column_parser(6, "Вибро защита")
+def _parse_vibro(raw: str) -> str:
+    if _RE_CYRILLIC.search(raw):
+        # ( ... ) + опционально '1' или '¹' — заменяем на опцию с ¹
+        return _RE_VIBRO_OPTION.sub(_vibro_option, raw).strip()
+    # старое поведение
+    return _base_and_options(raw)
+
+
+@column_parser(7, "Пределы давления")
+def _parse_pressure(raw: str) -> List[str]:
+    result = []
+    for line in raw.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        # split с группой: нечётные куски — разделители «единица;»
+        buf = ""
+        for i, chunk in enumerate(_RE_PRESSURE_UNIT.split(line)):
+            buf += chunk
+            if i % 2:
                 result.append(buf.strip())
-        row["Пределы давления"] = result
+                buf = ""
+        if buf.strip():
+            result.append(buf.strip())
+    return result
 
-        # 9. Диапазон температур (сохраняем отдельно, чтобы вынести на уровень params)
-        row["_temp_measured"] = parts[8].strip().replace('\n', ', ') + '.'
-        row["_temp_env"] = parts[9].strip().replace('\n', ', ') + '.'
 
-        return row
+def _temp_range(raw: str) -> str:
+    return raw.strip().replace('\n', ', ') + '.'
 
+
+# Диапазоны температур сохраняем отдельно, чтобы вынести на уровень params
+column_parser(8, "_temp_measured")(_temp_range)
+column_parser(9, "_temp_env")(_temp_range)
+
+
+def parse_row(parts: List[str]) -> dict:
+    """Строка таблицы (список ячеек) → словарь колонок, один проход по реестру."""
+    # Проверяем количество частей (пустые ячейки — тоже части, позиции не сдвигаются)
+    required_parts = MAX_COLS  # у нас минимум до parts[9]
+    if len(parts) < required_parts:
+        raise ValueError(
+            f"Ошибка парсинга строки: ожидалось минимум {required_parts} частей, "
+            f"но получено {len(parts)}.\nСтрока: {parts}"
+        )
+
+    row = {}
+    for index, name, parser in COLUMN_PARSERS:
+        value = parser(parts[index])
+        if value is not None:
+            row[name] = value
+    return row
+
+
+def convert(data: list) -> list:
     result = []
     for group in data:
         if "по заказу" in group["device"]:
@@ -251,8 +468,8 @@ def convert(data: list) -> list:
         images = []
 
         for row in group["rows"]:
-            if "зображен" in row:
-                images.extend(parse_images(row))
+            if any("зображен" in cell for cell in row):
+                images.extend(parse_images("\t".join(row)))
             else:
                 parsed_rows.append(parse_row(row))
 
@@ -1,49 +1,466 @@
 # html_to_pdf_sync.py
+import asyncio
+import atexit
+import hashlib
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable
+
+from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright
 from PyPDF2 import PdfMerger
-from pathlib import Path
 
+import metrics
 
-def html_to_pdf(input_html: str, output_pdf: str):
-    """Конвертация HTML → PDF без asyncio, надёжно под Flask."""
-    html_path = Path(input_html).resolve().as_uri()
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                "--no-sandbox",
-                "--disable-gpu",
-                "--allow-file-access-from-files"
-            ]
-        )
+
+POOL_SIZE = 2        # сколько браузеров держим запущенными
+MAX_RENDERS = 50     # после стольких рендеров браузер перезапускается
+LAUNCH_ARGS = [
+    "--no-sandbox",
+    "--disable-gpu",
+    "--allow-file-access-from-files"
+]
+MAP_HTML = "static/map.html"
+STATIC_URI = Path("static").resolve().as_uri()
+CACHE_DIR = Path("tmp/cache/pdf")
+PDF_OPTIONS = {
+    "format": "A4",
+    "scale": 0.8,
+    "print_background": True,
+    "margin": {"top": "0", "bottom": "0", "left": "0", "right": "0"},
+}
+
+
+class RendererPool:
+    """
+    Пул заранее запущенных Chromium.
+    Sync API Playwright привязан к потоку, в котором создан,
+    поэтому каждый браузер живёт в своём потоке и берёт задания из общей очереди.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, max_renders: int = MAX_RENDERS):
+        self.size = size
+        self.max_renders = max_renders
+        self._jobs: queue.Queue = queue.Queue()
+        self._threads = []
+        for i in range(size):
+            t = threading.Thread(target=self._worker, name=f"chromium-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, url: str | None = None, html: str | None = None,
+               wait_until: str = "networkidle", **options) -> Future:
+        """
+        Ставит рендер в очередь: страницу по url или готовую строку html
+        (загружается через set_content, без файла). Результат future — байты PDF.
+        wait_until="load" хватает, когда все ресурсы локальные.
+        """
+        future: Future = Future()
+        self._jobs.put((future, url, html, wait_until, options))
+        return future
+
+    def render(self, url: str | None = None, html: str | None = None,
+               wait_until: str = "networkidle", **options) -> bytes:
+        return self.submit(url, html, wait_until, **options).result()
+
+    def close(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def _worker(self):
+        with sync_playwright() as p:
+            # прогрев: браузер стартует сразу, а не при первом задании
+            try:
+                browser, page = self._launch(p)
+            except Exception:
+                browser = page = None
+            renders = 0
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                future, url, html, wait_until, options = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                future.launch_seconds = 0.0  # сколько из рендера ушло на запуск браузера
+                try:
+                    # проверка здоровья и плановый перезапуск
+                    if (browser is None or not browser.is_connected()
+                            or page.is_closed() or renders >= self.max_renders):
+                        if browser is not None:
+                            _close_quietly(browser)
+                        browser = page = None
+                        started = time.perf_counter()
+                        browser, page = self._launch(p)
+                        future.launch_seconds = time.perf_counter() - started
+                        renders = 0
+                    renders += 1
+                    if html is not None:
+                        page.set_content(html, wait_until=wait_until)
+                    else:
+                        page.goto(url, wait_until=wait_until)
+                    future.set_result(page.pdf(**{**PDF_OPTIONS, **options}))
+                except Exception as e:
+                    future.set_exception(e)
+                    # после ошибки браузеру не доверяем — перезапустим на следующем задании
+                    renders = self.max_renders
+            if browser is not None:
+                _close_quietly(browser)
+
+    @staticmethod
+    def _launch(p):
+        started = time.perf_counter()
+        browser = p.chromium.launch(headless=True, args=LAUNCH_ARGS)
         page = browser.new_page()
-        page.goto(html_path, wait_until="networkidle")
-        page.pdf(
-            path=output_pdf,
-            format="A4",
-            scale=0.8,
-            print_background=True,
-            margin={"top": "0", "bottom": "0", "left": "0", "right": "0"},
-        )
+        # set_content оставляет адрес страницы прежним; с about:blank Chromium
+        # не даст грузить file:// ресурсы шаблона, поэтому сразу уходим на file://
+        page.goto(STATIC_URI)
+        metrics.observe("catalog_pdf_step_seconds", time.perf_counter() - started, step="launch")
+        return browser, page
+
+
+def _close_quietly(browser):
+    try:
         browser.close()
+    except Exception:
+        pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> RendererPool:
+    """Общий пул браузеров процесса (создаётся при первом обращении)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = RendererPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+class AsyncRenderer:
+    """
+    Рендер на playwright.async_api: один общий браузер на event loop,
+    каждая задача — своя страница, одновременно не больше max_pages.
+    После max_renders рендеров запускается новый браузер, старый закрывается,
+    когда на нём доработают начатые страницы.
+    """
+
+    def __init__(self, max_pages: int = POOL_SIZE * 2, max_renders: int = MAX_RENDERS):
+        self.max_renders = max_renders
+        self._pages = asyncio.Semaphore(max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._renders = 0
+        self._in_flight: dict = {}  # {браузер: число открытых страниц}
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        await self._get_browser()
+
+    async def close(self):
+        for browser in list(self._in_flight):
+            await browser.close()
+        self._in_flight.clear()
+        self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _get_browser(self):
+        async with self._lock:
+            browser = self._browser
+            if browser is None or not browser.is_connected() or self._renders >= self.max_renders:
+                if browser is not None:
+                    await self._release(browser, retire=True)
+                started = time.perf_counter()
+                browser = await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+                metrics.observe("catalog_pdf_step_seconds", time.perf_counter() - started, step="launch")
+                self._browser = browser
+                self._renders = 0
+                self._in_flight[browser] = 0
+            self._renders += 1
+            self._in_flight[browser] += 1
+            return browser
+
+    async def _release(self, browser, retire: bool = False):
+        if not retire:
+            self._in_flight[browser] -= 1
+        if browser is not self._browser or retire:
+            if self._in_flight.get(browser) == 0:
+                del self._in_flight[browser]
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+
+    async def render(self, url: str | None = None, html: str | None = None,
+                     wait_until: str = "networkidle", **options) -> bytes:
+        async with self._pages:
+            browser = await self._get_browser()
+            try:
+                page = await browser.new_page()
+                try:
+                    if html is not None:
+                        # см. RendererPool._launch: без file:// адреса ресурсы шаблона не загрузятся
+                        await page.goto(STATIC_URI)
+                        await page.set_content(html, wait_until=wait_until)
+                    else:
+                        await page.goto(url, wait_until=wait_until)
+                    return await page.pdf(**{**PDF_OPTIONS, **options})
+                finally:
+                    await page.close()
+            except Exception:
+                # браузеру, упавшему на рендере, не доверяем
+                async with self._lock:
+                    if browser is self._browser:
+                        self._renders = self.max_renders
+                raise
+            finally:
+                async with self._lock:
+                    await self._release(browser)
+
+    async def render_cached(self, input_html: str, **options) -> bytes:
+        """Аналог render_cached для async: тот же кэш на диске и в памяти."""
+        src = Path(input_html).resolve()
+        opts = {**PDF_OPTIONS, **options}
+        key, pdf = _cache_lookup(src, opts)
+        if pdf is None:
+            pdf = await self.render(src.as_uri(), **opts)
+            _cache_store(src, opts, key, pdf)
+        return pdf
+
+
+def html_to_pdf(input_html: str, output_pdf: str, pool: RendererPool | None = None):
+    """Конвертация HTML → PDF без asyncio, надёжно под Flask."""
+    html_path = Path(input_html).resolve().as_uri()
+    pdf = (pool or get_pool()).render(html_path)
+    Path(output_pdf).write_bytes(pdf)
     print(f"✅ PDF создан: {output_pdf}")
 
 
+_cache_lock = threading.Lock()
+_cache_entries = {}  # {исходный html: (mtime_ns, size, опции, байты PDF)}
+
+
+def _cache_key(html_bytes: bytes, options: dict) -> str:
+    h = hashlib.sha256(html_bytes)
+    h.update(json.dumps(options, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _cache_lookup(src: Path, opts: dict) -> tuple[str | None, bytes | None]:
+    """Ищет PDF в кэше. Возвращает (ключ, байты); ключ None — попадание в память."""
+    st = src.stat()
+
+    # пока файл не трогали, даже не перечитываем его
+    with _cache_lock:
+        entry = _cache_entries.get(src)
+    if entry and entry[:3] == (st.st_mtime_ns, st.st_size, opts):
+        return None, entry[3]
+
+    key = _cache_key(src.read_bytes(), opts)
+    cached = CACHE_DIR / f"{key}.pdf"
+    pdf = cached.read_bytes() if cached.exists() else None
+    if pdf is not None:
+        _cache_remember(src, st, opts, pdf)
+    return key, pdf
+
+
+def _cache_store(src: Path, opts: dict, key: str, pdf: bytes):
+    cached = CACHE_DIR / f"{key}.pdf"
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cached.with_suffix(f".{threading.get_ident()}.part")
+    tmp.write_bytes(pdf)
+    tmp.replace(cached)
+    _cache_remember(src, src.stat(), opts, pdf)
+    print(f"🗂 PDF закэширован: {cached}")
+
+
+def _cache_remember(src: Path, st, opts: dict, pdf: bytes):
+    with _cache_lock:
+        _cache_entries[src] = (st.st_mtime_ns, st.st_size, opts, pdf)
+
+
+def render_cached(input_html: str, pool: RendererPool | None = None, **options) -> bytes:
+    """
+    Рендер статичной страницы с кэшем.
+    Ключ — sha256 содержимого HTML и опций печати, поэтому правка файла
+    сама инвалидирует кэш. Готовые PDF лежат в CACHE_DIR и в памяти.
+    """
+    src = Path(input_html).resolve()
+    opts = {**PDF_OPTIONS, **options}
+    key, pdf = _cache_lookup(src, opts)
+    if pdf is None:
+        pdf = (pool or get_pool()).render(src.as_uri(), **opts)
+        _cache_store(src, opts, key, pdf)
+    return pdf
+
+
 def merge_pdfs(pdf_list, output_pdf):
+    """Склеивает PDF. Элементы списка — пути или байты."""
     merger = PdfMerger()
     for pdf in pdf_list:
-        merger.append(pdf)
+        merger.append(io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
     merger.write(output_pdf)
     merger.close()
     print(f"📄 Итоговый PDF создан: {output_pdf}")
 
 
-def process(in_html: str, out_pdf: str):
-    """Полностью синхронный процесс."""
-    input_html2 = "static/map.html"
-    temp_pdf1 = "tmp/m.pdf"
-    temp_pdf2 = "tmp/map.pdf"
+def process(in_html: str, out_pdf: str, pool: RendererPool | None = None):
+    """
+    Полностью синхронный процесс.
+    Промежуточные PDF держим в памяти — параллельные задачи не делят файлов.
+    """
+    pool = pool or get_pool()
+    catalog_pdf = pool.render(Path(in_html).resolve().as_uri())
+    merge_pdfs([catalog_pdf, render_cached(MAP_HTML, pool)], out_pdf)
+
+
+SECTION_START = '<div class="page-content">'
+SECTION_END = '</section></div>'
+
+
+def split_sections(html: str) -> tuple[str, list[str], str]:
+    """Делит страницу json2html на голову, секции page-content и хвост (склейка даёт исходник)."""
+    first = html.find(SECTION_START)
+    last = html.rfind(SECTION_END)
+    if first < 0 or last < first:
+        return html, [], ""
+    last += len(SECTION_END)
+    body = html[first:last]
+    sections = [SECTION_START + s for s in body.split(SECTION_START)[1:]]
+    return html[:first], sections, html[last:]
+
+
+def _chunk(sections: list[str], parts: int) -> list[list[str]]:
+    """Режет секции на parts подряд идущих групп примерно равного объёма."""
+    total = sum(len(s) for s in sections)
+    groups: list[list[str]] = [[]]
+    acc = 0
+    for s in sections:
+        if groups[-1] and acc >= total * len(groups) / parts:
+            groups.append([])
+        groups[-1].append(s)
+        acc += len(s)
+    return groups
+
+
+def _chunks(html: str | Path, parts: int) -> list[dict]:
+    """
+    Задания рендера для каталога: {"html": кусок} по секциям или {"url": ...} для файла целиком.
+    Файл (Path) читается в память, только если его нужно резать на куски.
+    """
+    if isinstance(html, Path):
+        if parts < 2:
+            return [{"url": html.resolve().as_uri()}]
+        html = html.read_text(encoding="utf-8")
+    head, sections, tail = split_sections(html)
+    if parts < 2 or len(sections) < 2:
+        return [{"html": html}]
+    return [{"html": head + "".join(group) + tail} for group in _chunk(sections, parts)]
+
+
+def render_parallel(html: str | Path, pool: RendererPool | None = None, parts: int = 2,
+                    wait_until: str = "networkidle",
+                    timings: dict | None = None) -> list[bytes]:
+    """
+    Рендер каталога кусками одновременно в нескольких браузерах пула.
+    html — строка или Path к файлу страницы (целиком он грузится по file://).
+    Куски режутся по границам секций page-content и возвращаются в исходном порядке.
+    Каждый кусок начинается с новой страницы, поэтому на стыках возможны
+    недозаполненные страницы.
+    timings["launch"] — сколько секунд ушло на (пере)запуск браузеров по дороге.
+    """
+    pool = pool or get_pool()
+    futures = [pool.submit(wait_until=wait_until, **job) for job in _chunks(html, parts)]
+    pdfs = [f.result() for f in futures]
+    if timings is not None:
+        timings["launch"] = round(sum(f.launch_seconds for f in futures), 3)
+    return pdfs
+
+
+def _step(timings: dict, step: str, started: float) -> float:
+    """Записывает длительность шага этапа pdf и возвращает текущее время."""
+    now = time.perf_counter()
+    timings[step] = round(now - started, 3)
+    metrics.observe("catalog_pdf_step_seconds", now - started, step=step)
+    return now
+
+
+def process_html(html: str | Path, out_pdf: str, pool: RendererPool | None = None,
+                 wait_until: str = "networkidle", parts: int = 1,
+                 on_stage: Callable[[str], None] | None = None) -> dict:
+    """
+    То же, что process, но HTML приходит строкой или Path к файлу страницы.
+    parts > 1 — рендерить каталог кусками параллельно (см. render_parallel).
+    on_stage("merge") вызывается перед склейкой.
+    Возвращает время шагов, секунды: launch (входит в render), render, map, merge.
+    """
+    pool = pool or get_pool()
+    timings: dict = {}
+    started = time.perf_counter()
+    catalog_pdfs = render_parallel(html, pool, parts, wait_until, timings)
+    started = _step(timings, "render", started)
+    merge_with_map(catalog_pdfs, out_pdf, pool, on_stage, timings, started)
+    return timings
+
+
+def merge_with_map(catalog_pdfs: list[bytes], out_pdf: str, pool: RendererPool | None = None,
+                   on_stage: Callable[[str], None] | None = None,
+                   timings: dict | None = None, started: float | None = None) -> dict:
+    """
+    Дописывает к каталогу карту (из кэша) и склеивает итоговый PDF.
+    Общий хвост для рендера через Chromium и без браузера (pdf_native).
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter() if started is None else started
+    map_pdf = render_cached(MAP_HTML, pool)
+    started = _step(timings, "map", started)
+    if on_stage:
+        on_stage("merge")
+    merge_pdfs([*catalog_pdfs, map_pdf], out_pdf)
+    _step(timings, "merge", started)
+    return timings
+
+
+async def process_html_async(html: str | Path, out_pdf: str, renderer: AsyncRenderer,
+                             wait_until: str = "networkidle", parts: int = 1,
+                             on_stage: Callable[[str], None] | None = None) -> dict:
+    """
+    process_html для asyncio: куски каталога рендерятся страницами общего браузера,
+    склейка (синхронный pypdf) уходит в поток, чтобы не держать event loop.
+    Время шагов — как у process_html (запуск общего браузера в задачу не входит).
+    """
+    timings: dict = {}
+    started = time.perf_counter()
+    catalog_pdfs = await asyncio.gather(*(renderer.render(wait_until=wait_until, **job)
+                                          for job in _chunks(html, parts)))
+    started = _step(timings, "render", started)
+    return await merge_with_map_async(catalog_pdfs, out_pdf, renderer, on_stage, timings, started)
+
 
-    html_to_pdf(in_html, temp_pdf1)
-    html_to_pdf(input_html2, temp_pdf2)
-    merge_pdfs([temp_pdf1, temp_pdf2], out_pdf)
+async def merge_with_map_async(catalog_pdfs: list[bytes], out_pdf: str, renderer: AsyncRenderer,
+                               on_stage: Callable[[str], None] | None = None,
+                               timings: dict | None = None, started: float | None = None) -> dict:
+    """merge_with_map для asyncio: карта — через AsyncRenderer, склейка — в потоке."""
+    timings = {} if timings is None else timings
+    started = time.perf_counter() if started is None else started
+    map_pdf = await renderer.render_cached(MAP_HTML)
+    started = _step(timings, "map", started)
+    if on_stage:
+        on_stage("merge")
+    await asyncio.to_thread(merge_pdfs, [*catalog_pdfs, map_pdf], out_pdf)
+    _step(timings, "merge", started)
+    return timings
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Задача генератора, общая для catalog_server и catalog_server_async.
+
+Здесь всё, что не зависит от веб-фреймворка: папка задачи, ход этапов
+конвейера с замерами, ответы на загрузку (отказ проверки, кэш, очередь).
+Серверы отличаются только исполнением — это Runner: где идут этапы,
+каким браузером рендерится PDF и как будить ждущих событий по задаче.
+"""
+
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import metrics
+import pdf_optimize
+import pipeline
+from result_cache import get_cache
+from task_store import get_store
+
+DEBUG_ARTIFACTS = False  # оставлять catalog.json и catalog.html в папке задачи
+PDF_PARTS = 1            # >1 — рендерить большой каталог кусками параллельно
+OPTIMIZE_PDF = True      # ужимать итоговый PDF (pdf_optimize) перед сохранением в кэш
+EVENTS_KEEPALIVE = 15    # секунд между keep-alive комментариями в SSE
+EVENTS_POLL = 1          # секунд между проверками хранилища: задачу может менять другой процесс
+
+# состояние задач — в task_store ({"status": "pending"|"processing"|"done"|"error", ...})
+
+Reply = Tuple[Dict[str, Any], int]  # (тело JSON-ответа, HTTP-статус)
+
+
+def workspace(task_id: str) -> str:
+    """Отдельная папка задачи: tmp/<task_id>/ — параллельные задачи не делят файлов."""
+    return os.path.join('tmp', task_id)
+
+
+class Runner(ABC):
+    """
+    Как сервер исполняет этапы задачи. Все методы вызываются из потока задачи
+    и блокируют его до результата; таймауты — scheduler.STAGE_TIMEOUTS.
+    """
+
+    @abstractmethod
+    def run_stage(self, stage: str, fn: Callable[..., Any], *args, in_process: bool = True) -> Any:
+        """Этап в пуле процессов (или потоков) с таймаутом."""
+
+    @abstractmethod
+    def render_pdf(self, page, out_pdf: str, local_only: bool, parts: int,
+                   on_stage: Callable[[str], None]) -> Dict[str, float]:
+        """pipeline.render_pdf на браузере сервера."""
+
+    @abstractmethod
+    def finish_native(self, catalog_pdf: bytes, out_pdf: str,
+                      on_stage: Callable[[str], None]) -> Dict[str, float]:
+        """pipeline.finish_native на браузере сервера."""
+
+    @abstractmethod
+    def notify(self):
+        """Будит всех в этом процессе, кто ждёт событий по задачам."""
+
+
+def process_file(runner: Runner, task_id: str, cache_key: str,
+                 backend: str = pipeline.DEFAULT_BACKEND, wait_time: Optional[float] = None):
+    """Весь конвейер задачи: состояние, этапы и замеры пишутся в task_store."""
+    ws = workspace(task_id)
+    timings = {}  # замеры этапов, сохраняются в задаче
+    started = time.perf_counter()
+
+    def update_task(**fields):
+        get_store().update(task_id, **fields)
+        runner.notify()
+
+    def set_stage(stage):
+        update_task(stage=stage, progress=pipeline.STAGES[stage])
+
+    def timed(stage, fn, *args, in_process=True):
+        # в пуле процессов этап сам меряет себя (cpu и память — дочернего процесса)
+        t = time.perf_counter()
+        if in_process:
+            result, timings[stage] = runner.run_stage(stage, metrics.measure, fn, *args)
+        else:
+            result = runner.run_stage(stage, fn, *args, in_process=False)
+            timings[stage] = {'wall': round(time.perf_counter() - t, 3)}
+        metrics.record_stage(stage, timings[stage])
+        return result
+
+    try:
+        update_task(status='processing', wait_time=wait_time)
+        if wait_time is not None:
+            metrics.observe('catalog_queue_wait_seconds', wait_time)
+        debug_dir = ws if DEBUG_ARTIFACTS else None
+        set_stage('parsing')
+        data = timed('excel', pipeline.parse, os.path.join(ws, 'input.xlsx'), debug_dir)
+        counts = pipeline.counts(data)
+        metrics.inc('catalog_rows_total', counts['rows'])
+        metrics.inc('catalog_sections_total', counts['sections'])
+        update_task(timings=timings, **counts)
+        set_stage('images')
+        missing = timed('images', pipeline.preflight, data, in_process=False)
+        if missing:
+            update_task(missing_images=missing)
+        out_pdf = os.path.join(ws, 'catalog.pdf')
+        catalog_pdf = None
+        if backend == 'native':
+            # без браузера: каталог собирается сразу из данных, этап html не нужен
+            set_stage('pdf')
+            catalog_pdf = timed('pdf', pipeline.render_native, data)
+        if catalog_pdf is not None:
+            timings['pdf'].update(runner.finish_native(catalog_pdf, out_pdf, set_stage))
+        else:
+            set_stage('html')
+            page = timed('html', pipeline.build_html, data, os.path.join(ws, 'catalog.html'))
+            update_task(timings=timings)
+            set_stage('pdf')
+            t = time.perf_counter()
+            try:
+                steps = runner.render_pdf(page, out_pdf, not missing, PDF_PARTS, set_stage)
+            finally:
+                if not DEBUG_ARTIFACTS:
+                    page.unlink(missing_ok=True)  # промежуточный файл — только для отладки
+            timings['pdf'] = {'wall': round(time.perf_counter() - t, 3), **steps}
+            metrics.record_stage('pdf', timings['pdf'])
+        update_task(backend='native' if catalog_pdf is not None else 'chromium')
+        if OPTIMIZE_PDF:
+            set_stage('optimize')
+            report = timed('optimize', pdf_optimize.optimize, out_pdf)
+            metrics.inc('catalog_pdf_bytes_saved_total', report['saved'])
+            update_task(pdf_size=report)
+        if not missing:
+            # без части картинок PDF неполный: повторная загрузка должна попробовать их снова
+            get_cache().store(cache_key, out_pdf)
+        status = {'status': 'done', 'progress': 100}
+    except Exception as e:
+        status = {'status': 'error', 'error': str(e)}
+    total = time.perf_counter() - started
+    metrics.observe('catalog_task_seconds', total)
+    metrics.inc('catalog_tasks_total', status=status['status'])
+    update_task(timings={**timings, 'total': round(total, 3)}, **status)
+
+
+def rejected(report: Dict[str, Any]) -> Reply:
+    """Книга не прошла upload_check — в очередь не идёт."""
+    metrics.inc('catalog_uploads_rejected_total')
+    return {'error': 'Книга не прошла проверку', **report}, 422
+
+
+def queue_full(depth: int) -> Reply:
+    return {'error': 'Сервер перегружен, попробуйте позже', 'queue_depth': depth}, 429
+
+
+def from_cache(task_id: str, cache_key: str, report: Dict[str, Any]) -> Optional[Reply]:
+    """
+    Повторная загрузка того же файла: PDF из кэша кладётся в папку задачи
+    (она уже создана), задача сразу готова. None — в кэше нет, нужен конвейер.
+    """
+    ws = workspace(task_id)
+    hit = get_cache().fetch(cache_key, os.path.join(ws, 'catalog.pdf'))
+    metrics.inc('catalog_result_cache_total', result='hit' if hit else 'miss')
+    if not hit:
+        return None
+    in_xlsx = os.path.join(ws, 'input.xlsx')
+    if os.path.exists(in_xlsx):
+        os.remove(in_xlsx)  # конвейер не запустится — книга не нужна
+    get_store().create(task_id, ws, status='done', progress=100, cached=True)
+    return {'task_id': task_id, 'warnings': report['warnings']}, 200
+
+
+def accepted(task_id: str, position: int, report: Dict[str, Any]) -> Reply:
+    return {'task_id': task_id, 'queue_position': position, 'warnings': report['warnings']}, 200
+
+
+def render_metrics(queue_depth: int) -> str:
+    """Метрики процесса в формате Prometheus вместе с глубиной очереди."""
+    return metrics.render() + (f'# HELP catalog_queue_depth Задач в очереди\n'
+                               f'# TYPE catalog_queue_depth gauge\ncatalog_queue_depth {queue_depth}\n')
+
+
+def startup():
+    """Задачи умерших процессов — в ошибку, старые папки — под уборщик."""
+    get_store().fail_unfinished()
+    get_store().start_reaper()
@@ -1,13 +1,17 @@
 # build_html.py
 # -*- coding: utf-8 -*-
 import json
+import re
 import sys
+from array import array
+from itertools import islice, repeat
+from operator import eq
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple
 
-# ====== HTML генераторы ======
+import assets
 
-IMAGE_PREFIX = "https://raw.githubusercontent.com/FFF2115/ga56d7806abs7d/refs/heads/main/"
+# ====== HTML генераторы ======
 
 def generate_header(title: str,
                     description: str = "",
@@ -46,7 +50,7 @@ def generate_header(title: str,
         html.append('    <div class="images-label">образец прибора</div>')
         html.append('    <div class="images-wrapper">')
         for img in images:
-            html.append(f'      <img src="{IMAGE_PREFIX + img}">')
+            html.append(f'      <img src="{assets.image_src(img)}">')
         html.append('    </div>')
         html.append('  </div>')
 
@@ -61,51 +65,107 @@ def format_cell(value: Any) -> str:
     return str(value)
 
 
-def generate_html_table(data: List[Dict[str, Any]], columns: List[str]) -> str:
+def _join_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Потоковый аналог "\\n".join(lines): отдаёт куски, склейка которых даёт тот же текст."""
+    first = True
+    for line in lines:
+        yield line if first else "\n" + line
+        first = False
+
+
+_MERGED_RUN = re.compile(b"\x01+")
+SMALL_TABLE = 2000  # до стольких строк rowspan считается простым циклом (см. benchmarks/bench_rowspan.py)
+
+
+def rowspan_spans(data: List[Dict[str, Any]], columns: List[str]) -> array:
     """
-    data: список словарей с параметрами
-    columns: список столбцов (в нужном порядке)
+    rowspan всех ячеек: по каждому столбцу один проход RLE по значениям.
+    Соседние значения сравниваются на уровне C (map), серии совпадений ищет regex,
+    цикл на Python идёт только по объединённым сериям, а не по ячейкам.
+    Плоский массив n × len(columns): spans[row * len(columns) + col] —
+    rowspan ячейки, 0 — ячейка поглощена объединением выше.
     """
+    n = len(data)
+    m = len(columns)
+    spans = array("I", [0]) * (n * m)
+    if not n:
+        return spans
+
+    if n < SMALL_TABLE:
+        # до пары тысяч строк RLE выигрывает лишь на длинных сериях и доли миллисекунды,
+        # а на коротких сериях проигрывает циклу вдвое
+        for col_idx, col in enumerate(columns):
+            run_start = pos = col_idx
+            run_value = data[0].get(col)
+            spans[pos] = 1
+            for row in islice(data, 1, None):
+                pos += m
+                value = row.get(col)
+                if value == run_value:
+                    spans[run_start] += 1
+                else:
+                    spans[pos] = 1
+                    run_start, run_value = pos, value
+        return spans
+
+    zeros = array("I", [0]) * n
+    ones = array("I", [1]) * n
+    for col_idx, col in enumerate(columns):
+        values = list(map(dict.get, data, repeat(col, n)))
+        # flags[i] == 1: строка i + 1 совпадает с предыдущей
+        flags = bytes(map(eq, values[1:], values))
+        col_spans = ones[:]
+        # цикл на Python — только по объединённым сериям, их ищет regex по флагам
+        for run in _MERGED_RUN.finditer(flags):
+            start, end = run.start(), run.end() + 1
+            col_spans[start] = end - start
+            col_spans[start + 1:end] = zeros[:end - start - 1]
+        spans[col_idx::m] = col_spans
+    return spans
+
+
+def _table_lines(data: List[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
     if not data:
-        return "<!-- empty table -->"
+        yield "<!-- empty table -->"
+        return
 
-    n = len(data)
-    rowspan_map = {col: [1] * n for col in columns}
-
-    # считаем rowspan по столбцам
-    for col in columns:
-        i = 0
-        while i < n:
-            j = i + 1
-            vi = data[i].get(col)
-            while j < n and data[j].get(col) == vi:
-                rowspan_map[col][i] += 1
-                rowspan_map[col][j] = 0
-                j += 1
-            i = j
+    m = len(columns)
+    spans = rowspan_spans(data, columns)
 
     # строим HTML
-    html = [
-        "<table>",
-        "  <thead>",
-        "    <tr>" + "".join(f"<th>{c}</th>" for c in columns) + "</tr>",
-        "  </thead>",
-        "  <tbody>",
-    ]
+    yield "<table>"
+    yield "  <thead>"
+    yield "    <tr>" + "".join(f"<th>{c}</th>" for c in columns) + "</tr>"
+    yield "  </thead>"
+    yield "  <tbody>"
 
     for row_idx, row in enumerate(data):
-        html.append("    <tr>")
+        yield "    <tr>"
+        base = row_idx * m
         for col_idx, col in enumerate(columns):
-            if rowspan_map[col][row_idx] > 0:
-                span = f' rowspan="{rowspan_map[col][row_idx]}"' if rowspan_map[col][row_idx] > 1 else ""
+            rowspan = spans[base + col_idx]
+            if rowspan > 0:
+                span = f' rowspan="{rowspan}"' if rowspan > 1 else ""
                 # добавляем класс только первой колонке
                 cls = ' class="br_column"' if col_idx == 0 else ""
-                html.append(f'      <td{span}{cls}>{format_cell(row.get(col, ""))}</td>')
-        html.append("    </tr>")
+                yield f'      <td{span}{cls}>{format_cell(row.get(col, ""))}</td>'
+        yield "    </tr>"
+
+    yield "  </tbody>"
+    yield "</table>"
 
-    html.append("  </tbody>")
-    html.append("</table>")
-    return "\n".join(html)
+
+def iter_html_table(data: List[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    """Таблица кусками — строки таблицы отдаются по мере генерации."""
+    return _join_lines(_table_lines(data, columns))
+
+
+def generate_html_table(data: List[Dict[str, Any]], columns: List[str]) -> str:
+    """
+    data: список словарей с параметрами
+    columns: список столбцов (в нужном порядке)
+    """
+    return "".join(iter_html_table(data, columns))
 
 
 # ====== Вспомогательные функции ======
@@ -134,51 +194,97 @@ def infer_columns(all_rows: List[Dict[str, Any]],
 
 
 
+TEMPLATE_PATH = Path("static/template.html")
+
+_template_cache: Dict[Any, Tuple[str, str]] = {}
+
+
+def template_parts(title: str = "Каталог приборов") -> Tuple[str, str]:
+    """
+    Шаблон, разобранный один раз на «голову» и «хвост» вокруг {{ content }}.
+    Перечитывается только при изменении файла.
+    """
+    mtime = TEMPLATE_PATH.stat().st_mtime_ns
+    key = (TEMPLATE_PATH.resolve(), mtime, title)
+    parts = _template_cache.get(key)
+    if parts is None:
+        template = TEMPLATE_PATH.read_text(encoding="utf-8")
+
+        # относительные ссылки шаблона (bg3.png) ищем в static/, где бы ни лежал итоговый HTML
+        base = TEMPLATE_PATH.parent.resolve().as_uri() + "/"
+
+        # простая замена плейсхолдеров
+        template = template.replace("{{ title }}", title).replace("{{ base }}", base)
+        head, _, tail = template.partition("{{ content }}")
+        parts = (head, tail)
+        _template_cache.clear()
+        _template_cache[key] = parts
+    return parts
+
+
 def wrap_page(content: str, title: str = "Каталог приборов") -> str:
     """Оборачивает контент в HTML-страницу, используя template.html"""
-    template_path = Path("static/template.html")
-    template = template_path.read_text(encoding="utf-8")
-
-    # простая замена плейсхолдеров
-    page = template.replace("{{ title }}", title).replace("{{ content }}", content)
-    return page
+    head, tail = template_parts(title)
+    return head + content + tail
+
+
+def iter_section(item: Dict[str, Any]) -> Iterator[str]:
+    """HTML одной секции прибора (шапка + таблица) кусками."""
+    device = item.get("device", "Без названия")
+    description = item.get("description", "")
+    params = item.get("params")  # опционально
+    images = item.get("images")  # опционально
+
+    # данные таблицы
+    rows: List[Dict[str, Any]] = item.get("data", [])
+    if not isinstance(rows, list):
+        rows = []
+
+    # колонки: либо указаны явно, либо выводим по умолчанию/инференсу
+    columns = item.get("columns")
+    if not columns:
+        columns = infer_columns(rows)
+
+    header_html = generate_header(
+        title=device,
+        description=description,
+        params=params,
+        images=images
+    )
+    yield f'<div class="page-content"><section class="item">\n{header_html}\n\n'
+    yield from iter_html_table(rows, columns)
+    yield '\n</section></div>'
+
+
+def iter_sections(js: List[Dict[str, Any]]) -> Iterator[str]:
+    """Все секции каталога кусками, в том же виде, что и build_sections_from_json."""
+    if not js:
+        yield "<p>Нет данных.</p>"
+        return
+
+    for i, item in enumerate(js):
+        if i:
+            yield "\n\n"
+        yield from iter_section(item)
 
 
 def build_sections_from_json(js: Dict[str, Any]) -> str:
     """Создаёт большой HTML из структуры JSON."""
-    items = js
-    if not items:
-        return "<p>Нет данных.</p>"
-
-    pieces: List[str] = []
-    for item in items:
-        device = item.get("device", "Без названия")
-        description = item.get("description", "")
-        params = item.get("params")  # опционально
-        images = item.get("images")  # опционально
+    return "".join(iter_sections(js))
 
-        # данные таблицы
-        rows: List[Dict[str, Any]] = item.get("data", [])
-        if not isinstance(rows, list):
-            rows = []
 
-        # колонки: либо указаны явно, либо выводим по умолчанию/инференсу
-        columns = item.get("columns")
-        if not columns:
-            columns = infer_columns(rows)
+def iter_page(js: List[Dict[str, Any]], title: str = "Каталог приборов") -> Iterator[str]:
+    """Вся страница кусками: голова шаблона, секции, хвост."""
+    head, tail = template_parts(title)
+    yield head
+    yield from iter_sections(js)
+    yield tail
 
-        header_html = generate_header(
-            title=device,
-            description=description,
-            params=params,
-            images=images
-        )
-        table_html = generate_html_table(rows, columns)
 
-        section_html = f'<div class="page-content"><section class="item">\n{header_html}\n\n{table_html}\n</section></div>'
-        pieces.append(section_html)
-
-    return "\n\n".join(pieces)
+def write_page(js: List[Dict[str, Any]], stream: TextIO, title: str = "Каталог приборов"):
+    """Пишет страницу в поток по мере генерации — целиком в памяти она не собирается."""
+    for piece in iter_page(js, title):
+        stream.write(piece)
 
 
 # ====== entrypoint ======
@@ -197,11 +303,9 @@ def process(in_json: str, out_html: str):
         print("Ожидался список в JSON (массив).")
         sys.exit(1)
 
-    # Строим все секции сразу
-    all_sections_html = build_sections_from_json(js)
-    page = wrap_page(all_sections_html, title="Каталог приборов")
-
+    # Пишем секции по мере генерации
     out_path = Path(out_html)
-    out_path.write_text(page, encoding="utf-8")
+    with out_path.open("w", encoding="utf-8") as f:
+        write_page(js, f)
     print(f"Создан общий файл: {out_path.resolve()}")
 
@@ -1,7 +1,189 @@
-import excel2json
-import json2html
+# -*- coding: utf-8 -*-
+"""
+Пакетная генерация каталогов: много книг Excel за один запуск.
+
+Разбор Excel и сборка HTML идут в пуле процессов, PDF рендерит общий пул
+Chromium (html2pdf.RendererPool). Книги, PDF которых свежее самой книги
+и кода генератора, пропускаются.
+
+    python main.py dealers/                      # все .xlsx в папке
+    python main.py "dealers/*.xlsx" -o out/ -j 4
+    python main.py static/m4.xlsx --force
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
 import html2pdf
+import metrics
+import pdf_optimize
+import pipeline
+from result_cache import VERSION_FILES
+
+
+def collect_inputs(patterns: List[str]) -> List[Path]:
+    """Папки, маски и отдельные файлы → список .xlsx без повторов."""
+    found: Dict[Path, None] = {}
+    for pattern in patterns:
+        p = Path(pattern)
+        if p.is_dir():
+            paths = sorted(p.glob("*.xlsx"))
+        else:
+            paths = [Path(m) for m in sorted(glob.glob(pattern))]
+        for path in paths:
+            # временные файлы Excel (~$книга.xlsx) не книги
+            if not path.name.startswith("~$"):
+                found[path.resolve()] = None
+    return list(found)
+
+
+def output_for(xlsx: Path, out_dir: Optional[str]) -> Path:
+    return (Path(out_dir) if out_dir else xlsx.parent) / f"{xlsx.stem}.pdf"
+
+
+def up_to_date(xlsx: Path, out_pdf: Path) -> bool:
+    """PDF свежее книги и всех исходников, от которых он зависит."""
+    if not out_pdf.exists():
+        return False
+    newest = max(os.path.getmtime(p) for p in [xlsx, *VERSION_FILES])
+    return out_pdf.stat().st_mtime >= newest
+
+
+def prepare(xlsx: str, backend: str, out_html: str) -> Dict[str, Any]:
+    """
+    Excel → HTML (в файл out_html) в дочернем процессе: всё, что нужно рендеру PDF, и замеры.
+    С backend="native" каталог сразу рендерится здесь же в PDF без браузера.
+    """
+    data, parse_stats = metrics.measure(pipeline.parse, xlsx)
+    missing, images_stats = metrics.measure(pipeline.preflight, data)
+    prepared = {
+        "missing": missing,
+        "counts": pipeline.counts(data),
+        "timings": {"excel": parse_stats["wall"], "images": images_stats["wall"]},
+    }
+    if backend == "native":
+        catalog_pdf, native_stats = metrics.measure(pipeline.render_native, data)
+        if catalog_pdf is not None:
+            prepared.update(catalog_pdf=catalog_pdf)
+            prepared["timings"]["pdf"] = native_stats["wall"]
+            return prepared
+    prepared["page"], html_stats = metrics.measure(pipeline.build_html, data, out_html)
+    prepared["timings"]["html"] = html_stats["wall"]
+    return prepared
+
+
+def render(prepared: Dict[str, Any], out_pdf: Path, pool: html2pdf.RendererPool, parts: int,
+           optimize: bool = True) -> float:
+    t0 = time.perf_counter()
+    # пишем во временный файл: оборванный запуск не оставит «свежего» битого PDF
+    tmp = out_pdf.with_suffix(".pdf.part")
+    if "catalog_pdf" in prepared:
+        pipeline.finish_native(prepared["catalog_pdf"], str(tmp), pool)
+    else:
+        pipeline.render_pdf(prepared["page"], str(tmp), pool, not prepared["missing"], parts)
+        prepared["page"].unlink()
+    if optimize:
+        pdf_optimize.optimize(str(tmp))
+    tmp.replace(out_pdf)
+    return prepared["timings"].get("pdf", 0) + time.perf_counter() - t0
+
+
+def print_summary(results: List[Dict[str, Any]]):
+    print(f"\n{'файл':<32}{'блоков':>7}{'строк':>7}{'excel':>8}{'html':>8}{'pdf':>8}{'всего':>8}  итог")
+    for r in results:
+        t = r.get("timings", {})
+        cells = "".join(f"{t[k]:>8.2f}" if k in t else f"{'—':>8}" for k in ("excel", "html", "pdf", "total"))
+        counts = r.get("counts", {})
+        print(f"{r['name'][:31]:<32}{counts.get('sections', '—'):>7}{counts.get('rows', '—'):>7}"
+              f"{cells}  {r['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная генерация PDF-каталогов из книг Excel")
+    parser.add_argument("inputs", nargs="+", help="папки, маски или файлы .xlsx")
+    parser.add_argument("-o", "--out-dir", help="куда класть PDF (по умолчанию — рядом с книгой)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="процессов для разбора Excel и сборки HTML")
+    parser.add_argument("--browsers", type=int, default=html2pdf.POOL_SIZE,
+                        help="браузеров в пуле для рендера PDF")
+    parser.add_argument("--parts", type=int, default=1,
+                        help="на сколько кусков резать каждый каталог при рендере")
+    parser.add_argument("--backend", choices=pipeline.BACKENDS, default=pipeline.DEFAULT_BACKEND,
+                        help="чем рендерить каталог: Chromium или reportlab без браузера")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="не ужимать готовые PDF (pdf_optimize)")
+    parser.add_argument("-f", "--force", action="store_true", help="пересобрать и свежие PDF")
+    args = parser.parse_args()
+
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("Не найдено ни одной книги .xlsx")
+        sys.exit(1)
+
+    results: List[Dict[str, Any]] = []
+    todo = []
+    for xlsx in inputs:
+        out_pdf = output_for(xlsx, args.out_dir)
+        if not args.force and up_to_date(xlsx, out_pdf):
+            results.append({"path": xlsx, "name": xlsx.name, "status": "актуален"})
+        else:
+            todo.append((xlsx, out_pdf))
+    print(f"📚 Книг: {len(inputs)}, к сборке: {len(todo)}")
+
+    if todo:
+        # без браузера Chromium нужен разве что для карты, и то если её нет в кэше
+        pool = html2pdf.RendererPool(size=args.browsers) if args.backend == "chromium" else None
+        started: Dict[Path, float] = {}
+        # spawn: форк процесса с потоками Chromium ненадёжен
+        with ProcessPoolExecutor(max_workers=args.jobs,
+                                 mp_context=multiprocessing.get_context("spawn")) as processes, \
+                ThreadPoolExecutor(max_workers=args.browsers) as renders:
+            prepared = {}
+            for xlsx, out_pdf in todo:
+                started[xlsx] = time.perf_counter()
+                out_pdf.parent.mkdir(parents=True, exist_ok=True)
+                out_html = out_pdf.with_name(f"{out_pdf.stem}.part.html")
+                prepared[processes.submit(prepare, str(xlsx), args.backend, str(out_html))] = (xlsx, out_pdf)
+
+            # PDF уходит в общий пул браузеров, как только готов HTML книги
+            rendering = {}
+            for future in as_completed(prepared):
+                xlsx, out_pdf = prepared[future]
+                result = {"path": xlsx, "name": xlsx.name, "status": "ошибка"}
+                try:
+                    prep = future.result()
+                    result.update(counts=prep["counts"], timings=prep["timings"])
+                    job = renders.submit(render, prep, out_pdf, pool, args.parts, not args.no_optimize)
+                    rendering[job] = (xlsx, result)
+                except Exception as e:
+                    print(f"❌ {xlsx.name}: {e}")
+                    results.append(result)
+
+            for future in as_completed(rendering):
+                xlsx, result = rendering[future]
+                try:
+                    result["timings"]["pdf"] = future.result()
+                    result["status"] = "готов"
+                except Exception as e:
+                    print(f"❌ {xlsx.name}: {e}")
+                result["timings"]["total"] = time.perf_counter() - started[xlsx]
+                results.append(result)
+        if pool is not None:
+            pool.close()
+
+    order = {xlsx: i for i, xlsx in enumerate(inputs)}
+    results.sort(key=lambda r: order[r["path"]])
+    print_summary(results)
+    if any(r["status"] == "ошибка" for r in results):
+        sys.exit(1)
+
 
-excel2json.main()
-json2html.main()
-html2pdf.main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики генератора: гистограммы и счётчики в памяти процесса
+и их выдача в текстовом формате Prometheus для /metrics.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import resource
+except ImportError:  # не Unix — пик памяти не считаем
+    resource = None
+
+# границы корзин гистограмм, секунды
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+HELP = {
+    "catalog_stage_seconds": "Время этапа задачи (wall)",
+    "catalog_stage_cpu_seconds": "Процессорное время этапа",
+    "catalog_pdf_step_seconds": "Шаги этапа pdf: запуск браузера, рендер, карта, склейка",
+    "catalog_task_seconds": "Время задачи от начала обработки до результата",
+    "catalog_queue_wait_seconds": "Ожидание задачи в очереди",
+    "catalog_tasks_total": "Завершённые задачи по статусу",
+    "catalog_rows_total": "Разобрано строк таблиц",
+    "catalog_sections_total": "Собрано секций каталога",
+    "catalog_pdf_bytes_saved_total": "Сэкономлено байт ужатием итоговых PDF",
+    "catalog_uploads_rejected_total": "Загрузки, не прошедшие проверку upload_check",
+    "catalog_result_cache_total": "Обращения к кэшу готовых PDF (result_cache) по исходу",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_histograms: Dict[str, Dict[Labels, List[float]]] = {}  # {имя: {метки: [корзины..., сумма, число]}}
+_counters: Dict[str, Dict[Labels, float]] = {}
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, value: float, **labels):
+    """Добавляет наблюдение в гистограмму name."""
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        h = series.get(_labels(labels))
+        if h is None:
+            h = series[_labels(labels)] = [0.0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Увеличивает счётчик name."""
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+
+def _fmt(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def _value(v: float) -> str:
+    """Число без потери точности: целые — как есть, дробные — repr (а не 6 знаков :g)."""
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_fmt(labels)} {_value(value)}")
+        for name, series in sorted(_histograms.items()):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for labels, h in sorted(series.items()):
+                for bound, count in zip(BUCKETS, h):
+                    lines.append(f"{name}_bucket{_fmt(labels, (('le', f'{bound:g}'),))} {_value(count)}")
+                lines.append(f"{name}_bucket{_fmt(labels, (('le', '+Inf'),))} {_value(h[-1])}")
+                lines.append(f"{name}_sum{_fmt(labels)} {_value(h[-2])}")
+                lines.append(f"{name}_count{_fmt(labels)} {_value(h[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+def peak_rss_mb() -> float:
+    """Пик резидентной памяти текущего процесса, МБ (ru_maxrss в Linux — в КБ)."""
+    if resource is None:
+        return 0.0
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def measure(fn: Callable[..., Any], *args) -> Tuple[Any, Dict[str, float]]:
+    """
+    Выполняет fn(*args) и возвращает (результат, замеры): wall, cpu, peak_rss_mb.
+    Вызывается там, где идёт этап (в дочернем процессе пула), поэтому cpu —
+    время этого процесса, а peak_rss_mb — пик памяти процесса за всю его жизнь.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args)
+    return result, {
+        "wall": round(time.perf_counter() - wall, 3),
+        "cpu": round(time.process_time() - cpu, 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def record_stage(stage: str, stats: Dict[str, float]):
+    """Переносит замеры этапа (см. measure) в гистограммы."""
+    observe("catalog_stage_seconds", stats["wall"], stage=stage)
+    if "cpu" in stats:
+        observe("catalog_stage_cpu_seconds", stats["cpu"], stage=stage)
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+Рендер каталога в PDF без браузера (reportlab).
+
+Раскладывает ту же модель, что json2html (шапка прибора, параметры,
+картинки, таблица с rowspan), сразу в PDF. Размеры повторяют
+static/template.html при печати Chromium с масштабом 0.8; стеклянные
+градиенты, тени и скругления рамки секции заменены плоскими цветами.
+
+Нужны reportlab и шрифт DejaVu Sans (кириллица). Если их нет —
+NativeUnavailable, и вызывающий код рендерит через Chromium.
+"""
+
+import io
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape
+
+try:
+    from reportlab import rl_config
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import mm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.platypus import (Image, KeepTogether, Paragraph, SimpleDocTemplate,
+                                    Spacer, Table, TableStyle)
+except ImportError:  # без reportlab остаётся только Chromium
+    colors = None
+else:
+    # картинки в PDF — двоичными потоками: ASCII85 раздувает файл и дорог без C-ускорителя
+    rl_config.useA85 = 0
+
+import assets
+import json2html
+
+FONT = "DejaVuSans"
+FONT_FILES = {  # начертание → файл; курсива может не быть — тогда обычный
+    "normal": "DejaVuSans.ttf",
+    "bold": "DejaVuSans-Bold.ttf",
+    "italic": "DejaVuSans-Oblique.ttf",
+    "boldItalic": "DejaVuSans-BoldOblique.ttf",
+}
+FONT_DIRS = [
+    "static/fonts",
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/dejavu",
+    "/usr/share/fonts/TTF",
+    "/usr/local/share/fonts",
+    "/Library/Fonts",
+    "C:/Windows/Fonts",
+]
+BACKGROUND = Path("static/bg3.png")
+
+# CSS px → pt при печати: 0.75 pt на px и масштаб страницы 0.8
+PX = 0.75 * 0.8
+
+TEXT = "#1a2d40"
+ACCENT = "#0c4a8c"
+OPTIONAL = "#557a9e"
+
+
+class NativeUnavailable(Exception):
+    """Нет reportlab или шрифта с кириллицей — нужен рендер через Chromium."""
+
+
+_fonts_ready = False
+
+
+def find_font(filename: str) -> Optional[Path]:
+    for d in FONT_DIRS:
+        p = Path(d) / filename
+        if p.exists():
+            return p
+    return None
+
+
+def _register_fonts():
+    global _fonts_ready
+    if _fonts_ready:
+        return
+    if colors is None:
+        raise NativeUnavailable("reportlab не установлен")
+    regular = find_font(FONT_FILES["normal"])
+    if regular is None:
+        raise NativeUnavailable(f"Шрифт {FONT_FILES['normal']} не найден в {FONT_DIRS}")
+    names = {}
+    for style, filename in FONT_FILES.items():
+        path = find_font(filename)
+        if style == "boldItalic" and path is None:
+            path = find_font(FONT_FILES["bold"])
+        name = FONT if style == "normal" else f"{FONT}-{style}"
+        pdfmetrics.registerFont(TTFont(name, str(path or regular)))
+        names[style] = name
+    pdfmetrics.registerFontFamily(FONT, **names)
+    _fonts_ready = True
+
+
+# ====== Разметка ячеек ======
+# excel2json кладёт в ячейки немного HTML: <br> и span.optional / span.table_subtext.
+# Переводим его в разметку Paragraph, остальной текст экранируем.
+
+_TAGS = re.compile(r"<br>|<span class='(optional|table_subtext)'>|</span>")
+_SPAN_OPEN = f'<font color="{OPTIONAL}" size="{{size:.2f}}"><i>'
+_SPAN_SCALE = {"optional": 0.85, "table_subtext": 0.75}  # курсив, 0.85em / 0.75em
+
+
+def markup(value: Any, size: float) -> str:
+    """Значение ячейки (строка или список строк) → разметка Paragraph."""
+    if isinstance(value, list):
+        return "<br/>".join(markup(v, size) for v in value)
+    text = str(value)
+    out = []
+    pos = 0
+    for m in _TAGS.finditer(text):
+        out.append(escape(text[pos:m.start()]))
+        tag = m.group(0)
+        if tag == "<br>":
+            out.append("<br/>")
+        elif tag == "</span>":
+            out.append("</i></font>")
+        else:
+            cls = m.group(1)
+            out.append(_SPAN_OPEN.format(size=size * _SPAN_SCALE[cls]))
+        pos = m.end()
+    out.append(escape(text[pos:]))
+    return "".join(out)
+
+
+def _styles() -> Dict[str, "ParagraphStyle"]:
+    body = 14 * PX
+    return {
+        "title": ParagraphStyle("title", fontName=f"{FONT}-bold", fontSize=22 * PX,
+                                leading=22 * PX * 1.3, textColor=ACCENT, spaceAfter=10 * PX),
+        "text": ParagraphStyle("text", fontName=FONT, fontSize=body, leading=body * 1.5,
+                               textColor=TEXT, alignment=TA_LEFT),
+        "label": ParagraphStyle("label", fontName=f"{FONT}-bold", fontSize=13 * PX,
+                                leading=13 * PX * 1.3, textColor=ACCENT, alignment=TA_CENTER),
+        "th": ParagraphStyle("th", fontName=f"{FONT}-bold", fontSize=body, leading=body * 1.2,
+                             textColor=colors.white, alignment=TA_CENTER),
+        "td": ParagraphStyle("td", fontName=FONT, fontSize=body, leading=body * 1.2,
+                             textColor=TEXT, alignment=TA_CENTER),
+    }
+
+
+# ====== Шапка прибора ======
+
+def _param_block(flowables: list, width: float) -> "Table":
+    """.param-block: светлый фон и акцентная полоса слева."""
+    t = Table([[flowables]], colWidths=[width])
+    t.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#eef7ff")),
+        ("LINEBEFORE", (0, 0), (0, -1), 4 * PX, colors.HexColor("#5581b0")),
+        ("LEFTPADDING", (0, 0), (-1, -1), 14 * PX),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 14 * PX),
+        ("TOPPADDING", (0, 0), (-1, -1), 12 * PX),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 12 * PX),
+    ]))
+    return t
+
+
+def _images(names: List[str], max_width: float, styles) -> list:
+    """Подпись «образец прибора» и локальные картинки в ряд (max-height 200px)."""
+    readers = []
+    for name in names:
+        path = assets.local_path(name)
+        if path.exists():
+            readers.append((path, ImageReader(str(path)).getSize()))
+    if not readers:
+        return []
+
+    gap = 12 * PX
+    height = 200 * PX
+    widths = [w * height / h for _, (w, h) in readers]
+    # не шире колонки: ужимаем все картинки одинаково
+    scale = min(1.0, (max_width - gap * (len(widths) - 1)) / sum(widths))
+    row = [Image(str(path), width=w * scale, height=height * scale)
+           for (path, _), w in zip(readers, widths)]
+    pictures = Table([row], colWidths=[w * scale + gap for w in widths])
+    pictures.setStyle(TableStyle([("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                                  ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                                  ("LEFTPADDING", (0, 0), (-1, -1), gap / 2),
+                                  ("RIGHTPADDING", (0, 0), (-1, -1), gap / 2)]))
+    return [Paragraph("ОБРАЗЕЦ ПРИБОРА", styles["label"]), Spacer(1, 4 * PX), pictures]
+
+
+def header(item: Dict[str, Any], width: float, styles) -> "Table":
+    """.header-section: текст слева, картинки справа (не больше половины ширины)."""
+    images = _images(item.get("images") or [], width / 2 - 10 * PX, styles)
+    text_width = width / 2 if images else width
+    inner = text_width - 24 * PX  # padding секции и отступ до картинок
+
+    text = [Paragraph(escape(item.get("device", "Без названия")).upper(), styles["title"])]
+    if item.get("description"):
+        text.append(Paragraph(escape(item["description"]), styles["text"]))
+    blocks = [_param_block(text, inner)]
+    params = item.get("params")
+    if params:
+        lines = [Paragraph(f'<font name="{FONT}-bold" color="{ACCENT}">{escape(k)}:</font> '
+                           f'{escape(str(v))}', styles["text"]) for k, v in params.items()]
+        blocks += [Spacer(1, 12 * PX), _param_block(lines, inner)]
+
+    cells = [blocks, images] if images else [blocks]
+    widths = [text_width, width - text_width] if images else [width]
+    t = Table([cells], colWidths=widths)
+    t.setStyle(TableStyle([
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#eff7ff")),
+        ("BOX", (0, 0), (-1, -1), 1 * PX, colors.HexColor("#c5dffa")),
+        ("LEFTPADDING", (0, 0), (0, -1), 14 * PX),
+        ("TOPPADDING", (0, 0), (-1, -1), 3 * PX),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 14 * PX),
+        ("RIGHTPADDING", (-1, 0), (-1, -1), 10 * PX),
+    ]))
+    return t
+
+
+# ====== Таблица ======
+
+_STRIP_TAGS = re.compile(r"<[^>]+>")
+
+
+def _natural_width(value: Any, style) -> float:
+    """Ширина самой длинной строки ячейки без переносов (как при auto-раскладке таблицы)."""
+    lines = value if isinstance(value, list) else str(value).split("<br>")
+    return max((pdfmetrics.stringWidth(_STRIP_TAGS.sub("", line), style.fontName, style.fontSize)
+                for line in lines), default=0)
+
+
+def _column_widths(rows: List[Dict[str, Any]], columns: List[str], width: float, styles) -> List[float]:
+    """
+    .br_column — 170px; остальные колонки делят ширину пропорционально
+    самому длинному содержимому, но не уже самого длинного слова заголовка.
+    """
+    first = 170 * PX
+    if len(columns) == 1:
+        return [width]
+    pad = 28 * PX
+    natural, minimal = [], []
+    for col in columns[1:]:
+        natural.append(max(_natural_width(r.get(col, ""), styles["td"]) for r in rows) + pad)
+        minimal.append(max(pdfmetrics.stringWidth(w, styles["th"].fontName, styles["th"].fontSize)
+                           for w in col.split()) + pad + 1)
+    natural = [max(n, mn) for n, mn in zip(natural, minimal)]
+    free = width - first - sum(minimal)
+    extra = [n - mn for n, mn in zip(natural, minimal)]
+    k = min(1.0, max(free, 0) / sum(extra)) if sum(extra) > 0 else 0.0
+    widths = [mn + e * k for mn, e in zip(minimal, extra)]
+    # остаток ширины (если всё влезло) — поровну, таблица во всю ширину
+    spare = (width - first - sum(widths)) / len(widths)
+    return [first] + [w + spare for w in widths]
+
+
+def table(rows: List[Dict[str, Any]], columns: List[str], width: float, styles,
+          merge: bool = True) -> Optional["Table"]:
+    """
+    Таблица прибора с объединением одинаковых соседних ячеек (как rowspan в HTML).
+    merge=False — без объединения: значение повторяется в каждой строке.
+    """
+    if not rows or not columns:
+        return None
+    m = len(columns)
+    spans = json2html.rowspan_spans(rows, columns) if merge else [1] * (len(rows) * m)
+    size = styles["td"].fontSize
+
+    data = [[Paragraph(escape(c), styles["th"]) for c in columns]]
+    commands = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor(ACCENT)),
+        ("GRID", (0, 0), (-1, 0), 1 * PX, colors.HexColor("#0a3a6c")),
+        ("GRID", (0, 1), (-1, -1), 1 * PX, colors.HexColor("#e6f3fd")),
+        ("BOX", (0, 0), (-1, -1), 1 * PX, colors.HexColor("#dcedfc")),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("TOPPADDING", (0, 0), (-1, 0), 12 * PX),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 12 * PX),
+        ("TOPPADDING", (0, 1), (-1, -1), 10 * PX),
+        ("BOTTOMPADDING", (0, 1), (-1, -1), 10 * PX),
+        ("LEFTPADDING", (0, 0), (-1, -1), 14 * PX),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 14 * PX),
+    ]
+    for r, row in enumerate(rows):
+        cells = []
+        for c, col in enumerate(columns):
+            span = spans[r * m + c]
+            if span:
+                cells.append(Paragraph(markup(row.get(col, ""), size), styles["td"]))
+                if span > 1:
+                    commands.append(("SPAN", (c, r + 1), (c, r + span)))
+            else:
+                cells.append("")
+        data.append(cells)
+
+    t = Table(data, colWidths=_column_widths(rows, columns, width, styles), repeatRows=1)
+    t.setStyle(TableStyle(commands))
+    return t
+
+
+# ====== Страница ======
+
+def _draw_background(canvas, doc):
+    """body::before — bg3.png на всю страницу, center/cover."""
+    if not BACKGROUND.exists():
+        return
+    iw, ih = ImageReader(str(BACKGROUND)).getSize()
+    pw, ph = doc.pagesize
+    scale = max(pw / iw, ph / ih)
+    w, h = iw * scale, ih * scale
+    # по имени файла reportlab встраивает картинку один раз на документ
+    canvas.drawImage(str(BACKGROUND), (pw - w) / 2, (ph - h) / 2, width=w, height=h)
+
+
+def section(item: Dict[str, Any], width: float, styles, max_height: Optional[float] = None) -> list:
+    """max_height — высота кадра страницы: секция выше него будет разрезана."""
+    rows = item.get("data", [])
+    if not isinstance(rows, list):
+        rows = []
+    columns = item.get("columns") or json2html.infer_columns(rows)
+    head = header(item, width, styles)
+    parts = [head, Spacer(1, 12 * PX)]
+    t = table(rows, columns, width, styles)
+    if t is not None and max_height is not None:
+        tall = head.wrap(width, max_height)[1] + 12 * PX + t.wrap(width, max_height)[1]
+        if tall > max_height:
+            # SPAN через границу страницы reportlab не делит (LayoutError, TypeError в split):
+            # таблицу, которую придётся резать, рисуем без объединения ячеек
+            t = table(rows, columns, width, styles, merge=False)
+    if t is not None:
+        parts.append(t)
+    # .item { break-inside: avoid } — секция целиком на одной странице, если влезает
+    return [KeepTogether(parts), Spacer(1, 3 * mm * 0.8 + 12 * PX)]
+
+
+def render_catalog(js: List[Dict[str, Any]]) -> bytes:
+    """Список блоков каталога → PDF (только каталог, без карты)."""
+    _register_fonts()
+    styles = _styles()
+    out = io.BytesIO()
+    # отступ body (8px) + рамка и padding секции (2px + 18px)
+    margin = (8 + 2 + 18) * PX
+    doc = SimpleDocTemplate(out, pagesize=A4, leftMargin=margin, rightMargin=margin,
+                            topMargin=5 * mm * 0.8, bottomMargin=margin,
+                            title="Каталог приборов")
+    width = A4[0] - 2 * margin
+    max_height = doc.height - 12  # кадр страницы: поля документа минус padding кадра (6pt)
+    story = []
+    for item in js:
+        story += section(item, width, styles, max_height)
+    if not story:
+        story = [Paragraph("Нет данных.", styles["text"])]
+    doc.build(story, onFirstPage=_draw_background, onLaterPages=_draw_background)
+    return out.getvalue()
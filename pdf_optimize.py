@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Ужатие итогового PDF после склейки (pikepdf).
+
+- одинаковые потоки и шрифты каталога и карты хранятся один раз;
+- картинки крупнее нужного для TARGET_DPI при их размере на странице пережимаются;
+- потоки пережимаются, объекты собираются в object streams.
+
+Без pikepdf (или Pillow — для картинок) соответствующий шаг пропускается.
+
+    python pdf_optimize.py catalog.pdf [out.pdf]
+"""
+
+import hashlib
+import math
+import os
+import sys
+import zlib
+from pathlib import Path
+from typing import Dict, Tuple
+
+try:
+    import pikepdf
+except ImportError:  # без pikepdf PDF отдаётся как есть
+    pikepdf = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+TARGET_DPI = 150      # разрешение картинок при печати A4 — с запасом для экрана
+JPEG_QUALITY = 80
+MIN_GAIN = 1.25       # пережимаем, только если картинка крупнее нужного хотя бы во столько раз
+DEDUPE_TYPES = ("/Font", "/FontDescriptor", "/ExtGState")
+
+Matrix = Tuple[float, float, float, float, float, float]
+IDENTITY: Matrix = (1, 0, 0, 1, 0, 0)
+
+
+def _mul(a: Matrix, b: Matrix) -> Matrix:
+    """a × b в записи PDF: сначала a, потом b."""
+    return (a[0] * b[0] + a[1] * b[2], a[0] * b[1] + a[1] * b[3],
+            a[2] * b[0] + a[3] * b[2], a[2] * b[1] + a[3] * b[3],
+            a[4] * b[0] + a[5] * b[2] + b[4], a[4] * b[1] + a[5] * b[3] + b[5])
+
+
+def _placements(owner, resources, ctm: Matrix, sizes: Dict, seen: set):
+    """
+    Обходит поток содержимого и запоминает наибольший размер (pt), в котором
+    рисуется каждая картинка. Формы (Form XObject) обходятся рекурсивно.
+    """
+    xobjects = resources.get("/XObject", {}) if resources is not None else {}
+    stack = []
+    m = ctm
+    for operands, op in pikepdf.parse_content_stream(owner):
+        op = str(op)
+        if op == "q":
+            stack.append(m)
+        elif op == "Q":
+            m = stack.pop() if stack else ctm
+        elif op == "cm":
+            m = _mul(tuple(float(x) for x in operands), m)
+        elif op == "Do":
+            xobj = xobjects.get(operands[0])
+            if xobj is None:
+                continue
+            if xobj.get("/Subtype") == "/Image":
+                w, h = math.hypot(m[0], m[1]), math.hypot(m[2], m[3])
+                pw, ph = sizes.get(xobj.objgen, (0, 0))
+                sizes[xobj.objgen] = (max(pw, w), max(ph, h))
+            elif xobj.get("/Subtype") == "/Form" and xobj.objgen not in seen:
+                seen.add(xobj.objgen)
+                matrix = tuple(float(x) for x in xobj.get("/Matrix", IDENTITY))
+                _placements(xobj, xobj.get("/Resources", resources), _mul(matrix, m), sizes, seen)
+                seen.discard(xobj.objgen)
+
+
+def _resample(image, width: int, height: int) -> bool:
+    """Уменьшает картинку (и её SMask) до width × height. False — формат не трогаем."""
+    if image.get("/ImageMask") or "/Mask" in image or image.get("/BitsPerComponent") != 8:
+        return False
+    cs = image.get("/ColorSpace")
+    if isinstance(cs, pikepdf.Array) and cs[0] == "/ICCBased":
+        channels = int(cs[1].get("/N"))
+    elif cs in ("/DeviceRGB", "/DeviceGray"):
+        channels = 3 if cs == "/DeviceRGB" else 1
+    else:
+        return False
+    if channels not in (1, 3):
+        return False
+
+    pil = pikepdf.PdfImage(image).as_pil_image().convert("RGB" if channels == 3 else "L")
+    pil = pil.resize((width, height), Image.LANCZOS)
+    if image.get("/Filter") == "/DCTDecode":
+        import io
+        out = io.BytesIO()
+        pil.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True)
+        image.write(out.getvalue(), filter=pikepdf.Name.DCTDecode)
+    else:
+        image.write(zlib.compress(pil.tobytes(), 9), filter=pikepdf.Name.FlateDecode)
+    image.Width, image.Height = width, height
+    if "/DecodeParms" in image:
+        del image["/DecodeParms"]
+
+    smask = image.get("/SMask")
+    if smask is not None:
+        mask = pikepdf.PdfImage(smask).as_pil_image().convert("L").resize((width, height), Image.LANCZOS)
+        smask.write(zlib.compress(mask.tobytes(), 9), filter=pikepdf.Name.FlateDecode)
+        smask.Width, smask.Height = width, height
+        if "/DecodeParms" in smask:
+            del smask["/DecodeParms"]
+    return True
+
+
+def downsample_images(pdf, dpi: int = TARGET_DPI) -> int:
+    """Пережимает картинки крупнее, чем нужно для dpi при их размере на странице."""
+    if Image is None:
+        return 0
+    sizes: Dict[Tuple[int, int], Tuple[float, float]] = {}
+    for page in pdf.pages:
+        _placements(page.obj, page.obj.get("/Resources"), IDENTITY, sizes, set())
+
+    changed = 0
+    for objgen, (w_pt, h_pt) in sizes.items():
+        image = pdf.get_object(objgen)
+        width, height = int(image.Width), int(image.Height)
+        # сколько пикселей нужно по каждой оси; пропорции сохраняем
+        scale = max(w_pt / 72 * dpi / width, h_pt / 72 * dpi / height)
+        if scale * MIN_GAIN > 1:
+            continue
+        try:
+            if _resample(image, max(1, round(width * scale)), max(1, round(height * scale))):
+                changed += 1
+        except Exception as e:  # нестандартная картинка — оставляем как есть
+            print(f"⚠️ Картинка {objgen} не пережата: {e}")
+    return changed
+
+
+def _key(obj) -> str:
+    items = sorted((str(k), repr(v)) for k, v in obj.items() if k != "/Length")
+    raw = obj.read_raw_bytes() if isinstance(obj, pikepdf.Stream) else b""
+    return hashlib.sha256(repr(items).encode() + raw).hexdigest()
+
+
+def _rewrite(obj, remap: Dict):
+    """Подменяет ссылки на дубликаты ссылками на оставленный экземпляр."""
+    if isinstance(obj, (pikepdf.Dictionary, pikepdf.Stream)):
+        slots = [(k, obj[k]) for k in list(obj.keys())]
+    elif isinstance(obj, pikepdf.Array):
+        slots = list(enumerate(obj))
+    else:
+        return
+    for k, v in slots:
+        if not isinstance(v, pikepdf.Object):  # числа и bool pikepdf отдаёт питоновскими
+            continue
+        if v.is_indirect:
+            if v.objgen in remap:
+                obj[k] = remap[v.objgen]
+        else:
+            _rewrite(v, remap)
+
+
+def dedupe(pdf) -> int:
+    """
+    Склеивает побайтно одинаковые потоки (шрифты, картинки, формы) и одинаковые
+    словари шрифтов. Проходы повторяются: после склейки FontFile совпадут и FontDescriptor.
+    """
+    dropped: set = set()  # дубликаты остаются в pdf.objects до сохранения — не считаем их снова
+    while True:
+        canon: Dict[str, object] = {}
+        remap: Dict[Tuple[int, int], object] = {}
+        for obj in pdf.objects:
+            if obj.objgen in dropped:
+                continue
+            if isinstance(obj, pikepdf.Stream) or (
+                    isinstance(obj, pikepdf.Dictionary) and obj.get("/Type") in DEDUPE_TYPES):
+                first = canon.setdefault(_key(obj), obj)
+                if first.objgen != obj.objgen:
+                    remap[obj.objgen] = first
+        if not remap:
+            return len(dropped)
+        dropped.update(remap)
+        for obj in pdf.objects:
+            if obj.objgen not in dropped:
+                _rewrite(obj, remap)
+        _rewrite(pdf.trailer, remap)
+
+
+def optimize(path: str, out: str | None = None, dpi: int = TARGET_DPI) -> Dict[str, int]:
+    """
+    Ужимает PDF на месте (или в out). Результат записывается, только если он меньше.
+    Возвращает размеры до/после, сэкономленные байты и что было сделано.
+    """
+    before = os.path.getsize(path)
+    report = {"before": before, "after": before, "saved": 0, "images": 0, "deduped": 0}
+    if pikepdf is None:
+        return report
+
+    tmp = Path(f"{out or path}.opt")
+    with pikepdf.open(path) as pdf:
+        report["deduped"] = dedupe(pdf)
+        report["images"] = downsample_images(pdf, dpi)
+        pdf.remove_unreferenced_resources()
+        pdf.save(tmp, compress_streams=True, recompress_flate=True,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+    after = tmp.stat().st_size
+    if after < before:
+        tmp.replace(out or path)
+        report.update(after=after, saved=before - after)
+    else:
+        tmp.unlink()
+        if out:
+            Path(out).write_bytes(Path(path).read_bytes())
+    print(f"🗜 PDF ужат: {before} → {report['after']} байт (−{report['saved']})")
+    return report
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование: python pdf_optimize.py catalog.pdf [out.pdf]")
+        sys.exit(1)
+    print(optimize(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None))
+
+
+if __name__ == "__main__":
+    main()
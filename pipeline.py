@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Конвейер Excel → JSON → HTML → PDF.
+Данные каталога передаются между этапами объектами Python; HTML-страница
+пишется потоком в файл и грузится Chromium по file:// — целиком в памяти
+Python она не собирается. catalog.json пишется только при отладке (debug_dir).
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import assets
+import excel2json
+import html2pdf
+import json2html
+import pdf_native
+
+# чем рендерить PDF: Chromium (эталон) или reportlab без браузера (pdf_native)
+BACKENDS = ("chromium", "native")
+DEFAULT_BACKEND = "chromium"
+
+# этапы задачи и прогресс (%) для клиента
+STAGES = {"parsing": 10, "images": 25, "html": 40, "pdf": 55, "merge": 90, "optimize": 95}
+
+
+def parse(in_xlsx: str, debug_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Excel (все листы книги) → список блоков (то, что раньше писалось в JSON)."""
+    data = excel2json.convert(excel2json.parse_excel_to_json(in_xlsx))
+    if debug_dir:
+        out_json = Path(debug_dir) / "catalog.json"
+        out_json.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return data
+
+
+def build_html(data: List[Dict[str, Any]], out_html: str) -> Path:
+    """
+    Список блоков → HTML-страница в файле out_html. Страница пишется кусками по
+    мере генерации и целиком в памяти не собирается; Chromium грузит её по file://.
+    """
+    path = Path(out_html)
+    with path.open("w", encoding="utf-8") as f:
+        json2html.write_page(data, f)
+    return path
+
+
+def counts(data: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Объём каталога: секций (блоков) и строк таблиц."""
+    return {"sections": len(data), "rows": sum(len(item["data"]) for item in data)}
+
+
+def preflight(data: List[Dict[str, Any]]) -> List[str]:
+    """Докачивает картинки каталога в локальное хранилище; возвращает те, что так и не нашлись."""
+    missing = assets.preflight(data, fetch_missing=True)
+    if missing:
+        print("⚠️ Нет локальных картинок: " + ", ".join(missing))
+    return missing
+
+
+def render_pdf(page: Path, out_pdf: str,
+               pool: Optional[html2pdf.RendererPool] = None,
+               local_only: bool = False,
+               parts: int = 1,
+               on_stage: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """
+    HTML-страница (файл от build_html) → итоговый PDF (каталог + карта).
+    local_only: все картинки локальные — ждём только load, без networkidle.
+    parts: на сколько кусков резать каталог для параллельного рендера.
+    on_stage: сообщает о переходе к склейке ("merge").
+    Возвращает время шагов рендера (см. html2pdf.process_html).
+    """
+    return html2pdf.process_html(page, out_pdf, pool,
+                          wait_until="load" if local_only else "networkidle",
+                          parts=parts, on_stage=on_stage)
+
+
+def render_native(data: List[Dict[str, Any]]) -> Optional[bytes]:
+    """
+    Каталог в PDF без браузера. None — рендер без браузера здесь невозможен
+    (нет reportlab или шрифта) или упал, нужен путь через Chromium.
+    """
+    try:
+        return pdf_native.render_catalog(data)
+    except pdf_native.NativeUnavailable as e:
+        print(f"⚠️ Рендер без браузера недоступен ({e}), используем Chromium")
+    except Exception as e:
+        # раскладка reportlab падает на неожиданных данных — каталог всё равно нужен
+        print(f"⚠️ Рендер без браузера не удался ({type(e).__name__}: {e}), используем Chromium")
+    return None
+
+
+def finish_native(catalog_pdf: bytes, out_pdf: str,
+                  pool: Optional[html2pdf.RendererPool] = None,
+                  on_stage: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """Каталог от render_native + карта → итоговый PDF."""
+    return html2pdf.merge_with_map([catalog_pdf], out_pdf, pool, on_stage)
+
+
+def run(in_xlsx: str, out_pdf: str,
+        pool: Optional[html2pdf.RendererPool] = None,
+        debug_dir: Optional[str] = None,
+        parts: int = 1,
+        backend: str = DEFAULT_BACKEND):
+    """Весь конвейер одним вызовом."""
+    data = parse(in_xlsx, debug_dir)
+    missing = preflight(data)
+    if backend == "native":
+        catalog_pdf = render_native(data)
+        if catalog_pdf is not None:
+            finish_native(catalog_pdf, out_pdf, pool)
+            return
+    out_html = Path(debug_dir) / "catalog.html" if debug_dir else Path(out_pdf).with_suffix(".html")
+    page = build_html(data, str(out_html))
+    render_pdf(page, out_pdf, pool, local_only=not missing, parts=parts)
+    if not debug_dir:
+        page.unlink()
+
+
+async def render_pdf_async(page: Path, out_pdf: str,
+                           renderer: html2pdf.AsyncRenderer,
+                           local_only: bool = False,
+                           parts: int = 1,
+                           on_stage: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """render_pdf для асинхронного сервера: рендер на общем браузере AsyncRenderer."""
+    return await html2pdf.process_html_async(page, out_pdf, renderer,
+                                      wait_until="load" if local_only else "networkidle",
+                                      parts=parts, on_stage=on_stage)
+
+
+async def finish_native_async(catalog_pdf: bytes, out_pdf: str,
+                              renderer: html2pdf.AsyncRenderer,
+                              on_stage: Optional[Callable[[str], None]] = None) -> Dict[str, float]:
+    """finish_native для асинхронного сервера: карта рендерится на общем браузере."""
+    return await html2pdf.merge_with_map_async([catalog_pdf], out_pdf, renderer, on_stage)
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш готовых PDF по содержимому загруженной книги.
+Ключ — sha256 от версии кода/шаблонов, хранилища картинок и байтов файла,
+вытеснение — LRU по общему размеру.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import assets
+
+CACHE_DIR = Path("tmp/cache/results")
+MAX_BYTES = 500 * 2**20   # общий размер кэша на диске
+
+# всё, от чего зависит итоговый PDF
+VERSION_FILES = [
+    "excel2json.py",
+    "json2html.py",
+    "html2pdf.py",
+    "pipeline.py",
+    "pdf_native.py",
+    "pdf_optimize.py",
+    "assets.py",         # размер и качество картинок
+    "jobs.py",           # PDF_PARTS, OPTIMIZE_PDF
+    "static/template.html",
+    "static/map.html",   # карта в конце каждого каталога
+    "static/bg3.png",    # фон страниц
+]
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """Хэш исходников и шаблонов: правка любого из них делает старые записи недостижимыми."""
+    h = hashlib.sha256()
+    for name in VERSION_FILES:
+        h.update(name.encode())
+        h.update(Path(name).read_bytes())
+    return h.hexdigest()
+
+
+def asset_version() -> str:
+    """
+    Отпечаток хранилища картинок (имя, размер, время записи): заменённая
+    или докачанная картинка меняет ключ. Не кэшируется — хранилище растёт.
+    """
+    h = hashlib.sha256()
+    if assets.ASSET_DIR.is_dir():
+        for entry in sorted(os.scandir(assets.ASSET_DIR), key=lambda e: e.name):
+            if entry.is_file() and not entry.name.endswith(".part"):
+                st = entry.stat()
+                h.update(f"{entry.name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _link_or_copy(src: Path, dst: Path):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def hasher(self):
+        """sha256 с уже учтёнными версиями кода и картинок — для потокового подсчёта ключа по кускам файла."""
+        return hashlib.sha256(f"{code_version()}:{asset_version()}".encode())
+
+    @staticmethod
+    def digest(h, backend: str) -> str:
+        """Ключ из hasher() с байтами файла: разные движки рендера — разные записи."""
+        h.update(b"\0" + backend.encode())
+        return h.hexdigest()
+
+    def key(self, data: bytes, backend: str) -> str:
+        h = self.hasher()
+        h.update(data)
+        return self.digest(h, backend)
+
+    def fetch(self, key: str, dst: str) -> bool:
+        """Если PDF есть в кэше — кладём его в dst (жёсткой ссылкой) и возвращаем True."""
+        path = self.directory / f"{key}.pdf"
+        with self._lock:
+            try:
+                _link_or_copy(path, Path(dst))
+                os.utime(path)  # отметка для LRU
+            except FileNotFoundError:
+                return False
+            return True
+
+    def store(self, key: str, pdf: str):
+        """Сохраняет готовый PDF под ключом и вытесняет давно не использованные записи."""
+        path = self.directory / f"{key}.pdf"
+        with self._lock:
+            if not path.exists():
+                tmp = path.with_suffix(f".{threading.get_ident()}.part")
+                _link_or_copy(Path(pdf), tmp)
+                tmp.replace(path)
+            self._evict()
+
+    def _evict(self):
+        entries = [(p.stat().st_mtime, p.stat().st_size, p) for p in self.directory.glob("*.pdf")]
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
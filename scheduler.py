@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Ограниченная очередь задач генератора и пул исполнителей.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+WORKERS = 2        # сколько задач обрабатываем одновременно
+MAX_QUEUE = 10     # сколько задач может ждать в очереди
+# Секунды на этап. Таймаут освобождает задачу, но не всегда исполнителя:
+# этап в процессе снимается вместе с пулом (recycle_processes), этап в потоке
+# (images, рендер в Chromium) прервать нельзя — он дорабатывает сам, занимая поток
+# пула до конца; поэтому у докачки картинок свой бюджет (assets.FETCH_BUDGET).
+STAGE_TIMEOUTS = {
+    "excel": 60,
+    "images": 60,   # assets.FETCH_BUDGET на докачку + запас на уже начатую загрузку
+    "html": 60,
+    "pdf": 180,
+    "optimize": 120,
+}
+
+
+class QueueFull(Exception):
+    """Очередь заполнена — новую задачу принять нельзя."""
+
+
+class StageTimeout(Exception):
+    """Этап не уложился в отведённое время."""
+
+
+def process_pool(workers: int = WORKERS) -> ProcessPoolExecutor:
+    # spawn: форк процесса с потоками Chromium ненадёжен
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def recycle_processes(pool: ProcessPoolExecutor, grace: float):
+    """
+    Списывает пул, в котором завис этап: новых этапов он не получает, уже
+    отправленные в него чужие этапы доделываются за grace секунд, затем
+    оставшиеся процессы убиваются.
+    """
+    # публичного способа убить процессы пула до Python 3.14 нет; shutdown обнуляет список
+    procs = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False)
+
+    def reap():
+        time.sleep(grace)
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+
+    threading.Thread(target=reap, name="pool-reaper", daemon=True).start()
+
+
+def wait_stage(stage: str, future: Future, timeout: Optional[float]) -> Any:
+    """
+    Ждёт результат этапа; по таймауту отменяет его и бросает StageTimeout.
+    Уже начатый этап cancel() не останавливает: процесс или поток занят им
+    и дальше — пул процессов после таймаута надо сменить (recycle_processes).
+    """
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        raise StageTimeout(f"Этап {stage} превысил {timeout} с")
+
+
+class JobScheduler:
+    """
+    Задачи ждут в ограниченной очереди и разбираются WORKERS потоками.
+    Тяжёлые этапы на Python (разбор Excel, сборка HTML) уходят в пул процессов,
+    остальные выполняются в пуле потоков — оба с таймаутом на этап.
+    """
+
+    def __init__(self,
+                 workers: int = WORKERS,
+                 max_queue: int = MAX_QUEUE,
+                 stage_timeouts: Optional[Dict[str, float]] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.stage_timeouts = {**STAGE_TIMEOUTS, **(stage_timeouts or {})}
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._waiting: List[str] = []           # task_id в порядке очереди
+        self._times: Dict[str, Dict[str, float]] = {}
+
+        self._processes = process_pool(workers)
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage")
+        for i in range(workers):
+            threading.Thread(target=self._worker, name=f"job-{i}", daemon=True).start()
+
+    def submit(self, task_id: str, fn: Callable[..., Any], *args) -> int:
+        """Ставит задачу в очередь и возвращает её позицию (с 1). Если места нет — QueueFull."""
+        with self._lock:
+            try:
+                self._queue.put_nowait((task_id, fn, args))
+            except queue.Full:
+                raise QueueFull(f"Очередь заполнена ({self.max_queue} задач)")
+            self._waiting.append(task_id)
+            self._times[task_id] = {"queued": time.monotonic()}
+            return len(self._waiting)
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._waiting)
+
+    def info(self, task_id: str) -> Dict[str, Any]:
+        """Позиция в очереди, глубина очереди и время ожидания задачи."""
+        with self._lock:
+            times = self._times.get(task_id)
+            if times is None:
+                return {}
+            info: Dict[str, Any] = {"queue_depth": len(self._waiting)}
+            if task_id in self._waiting:
+                info["queue_position"] = self._waiting.index(task_id) + 1
+            started = times.get("started", time.monotonic())
+            info["wait_time"] = round(started - times["queued"], 3)
+            return info
+
+    def run_stage(self, stage: str, fn: Callable[..., Any], *args, in_process: bool = True) -> Any:
+        """
+        Выполняет этап в пуле процессов (или потоков) с таймаутом из stage_timeouts.
+        После таймаута в процессе пул меняется на новый: зависший процесс не держит слот.
+        """
+        executor = self._processes if in_process else self._threads
+        try:
+            return wait_stage(stage, executor.submit(fn, *args), self.stage_timeouts.get(stage))
+        except StageTimeout:
+            if in_process:
+                with self._lock:
+                    if self._processes is executor:  # соседняя задача могла сменить пул раньше
+                        self._processes = process_pool(self.workers)
+                        recycle_processes(executor, grace=max(self.stage_timeouts.values()))
+            raise
+
+    def _worker(self):
+        while True:
+            task_id, fn, args = self._queue.get()
+            with self._lock:
+                self._waiting.remove(task_id)
+                self._times[task_id]["started"] = time.monotonic()
+            try:
+                fn(task_id, *args)
+            except Exception as e:
+                print(f"Задача {task_id} упала: {e}")
+            finally:
+                with self._lock:
+                    self._times.pop(task_id, None)
+                self._queue.task_done()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище задач генератора в SQLite (режим WAL).
+
+Состояние задачи, тайминги и путь к папке с файлами переживают перезапуск
+и видны всем процессам сервера. У каждой задачи есть владелец — процесс,
+который её ведёт: при старте ошибкой помечаются только задачи умерших
+владельцев. Фоновый уборщик удаляет папки завершённых задач по возрасту
+и по общему объёму tmp/.
+"""
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DB_PATH = Path("tmp/tasks.sqlite3")
+WORK_DIR = Path("tmp")
+TASK_TTL = 24 * 3600       # секунд храним файлы завершённой задачи
+MAX_BYTES = 2 * 2**30      # общий объём папок задач в tmp/
+REAP_INTERVAL = 600        # секунд между проходами уборщика
+FINISHED = ("done", "error")
+
+# отдельные колонки — то, по чему ищем и убираем; остальное (этап, ошибка,
+# тайминги, недостающие картинки...) лежит в data как JSON
+_COLUMNS = ("status", "progress", "workspace")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id   TEXT PRIMARY KEY,
+    status    TEXT NOT NULL,
+    progress  INTEGER NOT NULL DEFAULT 0,
+    workspace TEXT NOT NULL,
+    data      TEXT NOT NULL DEFAULT '{}',
+    created   REAL NOT NULL,
+    updated   REAL NOT NULL,
+    version   INTEGER NOT NULL DEFAULT 0,
+    owner     TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS tasks_status_updated ON tasks (status, updated);
+"""
+
+
+class TaskStore:
+    def __init__(self, path: Path = DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.owner = _owner()
+        with self._conn() as db:
+            db.executescript(_SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(tasks)")}
+            if "owner" not in columns:  # база прошлой версии: владельцев нет, задачи считаем осиротевшими
+                db.execute("ALTER TABLE tasks ADD COLUMN owner TEXT NOT NULL DEFAULT ''")
+
+    def _conn(self) -> sqlite3.Connection:
+        # соединение на поток: sqlite3 не любит делить его между потоками
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def create(self, task_id: str, workspace: str, status: str = "pending", **fields):
+        now = time.time()
+        progress = fields.pop("progress", 0)
+        self._conn().execute(
+            "INSERT INTO tasks (task_id, status, progress, workspace, data, created, updated, version, owner)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)",
+            (task_id, status, progress, str(workspace), json.dumps(fields, ensure_ascii=False), now, now,
+             self.owner))
+
+    def update(self, task_id: str, **fields):
+        """Меняет поля задачи; прочие поля data сохраняются."""
+        db = self._conn()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            if row is None:
+                return
+            data = json.loads(row["data"])
+            cols = {k: fields.pop(k) for k in _COLUMNS if k in fields}
+            data.update(fields)
+            sets = "".join(f"{k} = ?, " for k in cols)
+            db.execute(f"UPDATE tasks SET {sets}data = ?, updated = ?, version = version + 1"
+                       " WHERE task_id = ?",
+                       (*cols.values(), json.dumps(data, ensure_ascii=False), time.time(), task_id))
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Состояние задачи в том виде, что отдаёт API, или None."""
+        row = self._conn().execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {"status": row["status"], "progress": row["progress"], **json.loads(row["data"])}
+
+    def version(self, task_id: str) -> int:
+        """Счётчик изменений задачи (0 — задачи нет): по нему SSE видит новые события."""
+        row = self._conn().execute("SELECT version FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row["version"] if row else 0
+
+    def pdf_path(self, task_id: str) -> Optional[str]:
+        """Путь к готовому PDF, если задача завершена и файл на месте."""
+        row = self._conn().execute("SELECT status, workspace FROM tasks WHERE task_id = ?",
+                                   (task_id,)).fetchone()
+        if row is None or row["status"] != "done":
+            return None
+        path = os.path.join(row["workspace"], "catalog.pdf")
+        return path if os.path.exists(path) else None
+
+    def fail_unfinished(self, error: str = "Сервер перезапущен, загрузите файл заново") -> List[str]:
+        """
+        Задачи, чей процесс-владелец умер, потеряны вместе с его очередью — помечаем
+        их ошибкой. Задачи живых процессов (второй сервер на той же базе) не трогаем.
+        """
+        failed = []
+        for row in self._conn().execute(
+                "SELECT task_id, owner FROM tasks WHERE status NOT IN (?, ?)", FINISHED).fetchall():
+            if not _owner_alive(row["owner"]):
+                self.update(row["task_id"], status="error", error=error)
+                failed.append(row["task_id"])
+        return failed
+
+    def reap(self, ttl: float = TASK_TTL, max_bytes: int = MAX_BYTES,
+             work_dir: Path = WORK_DIR) -> List[str]:
+        """
+        Удаляет завершённые задачи старше ttl, затем самые старые завершённые,
+        пока папки задач не уложатся в max_bytes. Папки в work_dir без записи
+        в хранилище (остатки старых версий) удаляются по тому же ttl.
+        """
+        db = self._conn()
+        now = time.time()
+        removed = []
+
+        rows = db.execute("SELECT task_id, workspace, updated FROM tasks"
+                          " WHERE status IN (?, ?) ORDER BY updated", FINISHED).fetchall()
+        sizes = {row["task_id"]: _dir_size(row["workspace"]) for row in rows}
+        total = sum(sizes.values())
+        for row in rows:
+            if now - row["updated"] <= ttl and total <= max_bytes:
+                break
+            shutil.rmtree(row["workspace"], ignore_errors=True)
+            db.execute("DELETE FROM tasks WHERE task_id = ?", (row["task_id"],))
+            total -= sizes[row["task_id"]]
+            removed.append(row["task_id"])
+
+        known = {Path(r["workspace"]).resolve()
+                 for r in db.execute("SELECT workspace FROM tasks").fetchall()}
+        for p in Path(work_dir).iterdir():
+            if (_is_task_dir(p) and p.resolve() not in known
+                    and now - p.stat().st_mtime > ttl):
+                shutil.rmtree(p, ignore_errors=True)
+                removed.append(p.name)
+
+        if removed:
+            print(f"🧹 Удалено задач: {len(removed)}")
+        return removed
+
+    def start_reaper(self, interval: float = REAP_INTERVAL) -> threading.Thread:
+        """Фоновый поток, вызывающий reap раз в interval секунд."""
+        def loop():
+            while True:
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"⚠️ Уборка tmp/ не удалась: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="reaper", daemon=True)
+        thread.start()
+        return thread
+
+
+def _boot_id() -> str:
+    # меняется при каждой загрузке системы: pid из прошлой загрузки ничего не значит
+    try:
+        return Path("/proc/sys/kernel/random/boot_id").read_text().strip()
+    except OSError:
+        return ""
+
+
+def _start_time(pid: int) -> str:
+    """Момент запуска процесса (тики от загрузки) — отличает его от нового с тем же pid."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+    except OSError:
+        return ""
+    return stat.rsplit(")", 1)[1].split()[19]  # после «)» идут поля с 3-го, starttime — 22-е
+
+
+def _owner() -> str:
+    """Владелец задач этого процесса: хост, загрузка системы, pid и время запуска."""
+    pid = os.getpid()
+    return f"{socket.gethostname()}:{_boot_id()}:{pid}:{_start_time(pid)}"
+
+
+def _owner_alive(owner: str) -> bool:
+    if not owner:
+        return False
+    host, boot, pid, started = owner.rsplit(":", 3)
+    if host != socket.gethostname():
+        return True  # процесс на другой машине отсюда не проверить
+    if boot != _boot_id():
+        return False
+    if started:
+        return _start_time(int(pid)) == started
+    try:
+        os.kill(int(pid), 0)  # без /proc: только проверка, что pid существует
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _is_task_dir(p: Path) -> bool:
+    # папки задач названы uuid4: 8-4-4-4-12
+    return p.is_dir() and len(p.name) == 36 and p.name.count("-") == 4
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+_store: Optional[TaskStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> TaskStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TaskStore()
+        return _store
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+import excel2json
+
+ROOT = Path(__file__).resolve().parent.parent
+HEADER = [f"Колонка {i}" for i in range(1, 11)]
+
+
+@pytest.fixture
+def book(tmp_path) -> str:
+    """Два блока, между ними длинный пропуск строк, в конце — отформатированная пустая строка."""
+    wb = Workbook()
+    ws = wb.active
+    rows = [["ПРИБОР 1"], ["описание"], HEADER, ["М1", "40"], ["", "50"], [],
+            ["ПРИБОР 2"], ["описание"], HEADER, ["М2", "63"]]
+    for i, row in enumerate(rows, start=1):
+        r = i if i < 7 else i + 20  # второй блок — после 20 пустых строк
+        for c, v in enumerate(row, start=1):
+            ws.cell(row=r, column=c, value=v)
+    ws.cell(row=200, column=1).number_format = "0.00"
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def _rows(path):
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return list(excel2json._iter_rows(wb.worksheets[0]))
+    finally:
+        wb.close()
+
+
+def _non_empty(rows):
+    return [(i, v) for i, v in rows if any(v)]
+
+
+@pytest.mark.parametrize("path", ["book", str(ROOT / "static/m4.xlsx")])
+def test_public_fallback_matches_sheet_parser(monkeypatch, request, path):
+    if path == "book":
+        path = request.getfixturevalue("book")
+    fast = _rows(path)
+    parsed = excel2json.parse_excel_to_json(path)
+
+    # openpyxl без внутреннего парсера листа: остаётся публичный iter_rows
+    monkeypatch.setattr(excel2json, "WorkSheetParser", None)
+    slow = _rows(path)
+    assert _non_empty(slow) == _non_empty(fast)
+    assert excel2json.parse_excel_to_json(path) == parsed
+
+
+def test_gap_is_bounded(book):
+    rows = _rows(book)
+    numbers = [i for i, _ in rows]
+    assert numbers == sorted(numbers)
+    assert len(rows) <= 10 + 2 * excel2json.MAX_GAP + 1
+
+
+@pytest.mark.parametrize("path", ["book", str(ROOT / "static/m4.xlsx")])
+def test_untyped_rows_match_typed(request, path):
+    if path == "book":
+        path = request.getfixturevalue("book")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        assert list(excel2json._iter_rows(ws, typed=False)) == list(excel2json._iter_rows(ws))
+    finally:
+        wb.close()
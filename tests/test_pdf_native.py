@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import pdf_native
+import pipeline
+
+
+def _item(rows: int, run: int) -> dict:
+    data = [{"Модель": f"М-{i // run}", "Диапазон": f"0…{i + 1}", "Класс": "1,5"} for i in range(rows)]
+    return {"device": "Манометр", "description": "Тест", "data": data,
+            "columns": ["Модель", "Диапазон", "Класс"]}
+
+
+@pytest.fixture(autouse=True)
+def _native():
+    try:
+        pdf_native._register_fonts()
+    except pdf_native.NativeUnavailable as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize("rows, run", [(45, 45), (150, 50), (300, 60)])
+def test_rowspan_across_page(rows, run):
+    # объединённые ячейки длиннее страницы: раньше LayoutError / TypeError из reportlab
+    pdf = pdf_native.render_catalog([_item(7, 7), _item(rows, run)])
+    assert pdf.startswith(b"%PDF")
+
+
+def test_short_table_keeps_spans():
+    styles = pdf_native._styles()
+    parts = pdf_native.section(_item(5, 5), 500, styles, max_height=800)
+    table = parts[0]._content[-1]
+    assert any(cmd[0] == "SPAN" for cmd in table._spanCmds)
+
+
+def test_render_native_falls_back(monkeypatch):
+    def broken(data):
+        raise TypeError("reportlab")
+
+    monkeypatch.setattr(pdf_native, "render_catalog", broken)
+    assert pipeline.render_native([_item(3, 1)]) is None
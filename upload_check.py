@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Быстрая проверка загруженной книги до постановки в очередь.
+
+Один потоковый проход по листам (read_only, без разбора в JSON и HTML):
+тип и размер файла, раскладка блоков (заголовок → описание → шапка → таблица),
+число заполненных колонок, строки картинок. Ошибки — с листом и номером строки,
+чтобы их можно было сразу исправить в Excel; книга с ошибками в очередь не идёт.
+
+    python upload_check.py книга.xlsx
+"""
+
+import json
+import re
+import sys
+import zipfile
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+from openpyxl import load_workbook
+
+import assets
+import excel2json
+from excel2json import MAX_COLS
+
+ALLOWED_SUFFIXES = (".xlsx", ".xlsm")
+MAX_UPLOAD_BYTES = 20 * 2**20  # книга каталога — сотни килобайт; больше — почти наверняка не она
+MAX_ERRORS = 50                # дальше отчёт обрезается: хватит, чтобы понять, что не так
+MAX_WARNINGS = 50              # остальные предупреждения сводятся в одну строку «…и ещё N»
+
+_RE_FILE = re.compile(r"\b[\w-]+\.[A-Za-z]{3,4}\b")
+
+Report = Dict[str, Any]
+
+
+def _add(report: Report, kind: str, message: str, sheet: Optional[str] = None, row: Optional[int] = None):
+    if kind == "warnings" and len(report[kind]) >= MAX_WARNINGS:
+        report["_more_warnings"] = report.get("_more_warnings", 0) + 1
+        return
+    report[kind].append({"sheet": sheet, "row": row, "message": message})
+
+
+def _check_images(report: Report, vals: List[str], sheet: str, row: int):
+    text = "\t".join(vals)
+    names = excel2json.parse_images(text)
+    if not names:
+        _add(report, "errors", "Строка картинок без имён файлов (jpg, jpeg, png, gif)", sheet, row)
+    unsupported = [f for f in _RE_FILE.findall(text) if f not in names]
+    if unsupported:
+        _add(report, "warnings", f"Картинки в неподдерживаемом формате пропущены: {', '.join(unsupported)}",
+             sheet, row)
+    missing = [name for name in names if not assets.is_local(name)]
+    if missing:
+        _add(report, "warnings", f"Картинок нет в хранилище, их будут скачивать: {', '.join(missing)}",
+             sheet, row)
+
+
+def _check_sheet(ws, report: Report) -> int:
+    """Проходит лист тем же автоматом, что excel2json._parse_rows. Возвращает число блоков."""
+    sheet = ws.title
+    blocks = 0
+    device = None       # заголовок текущего блока
+    device_row = None
+    checked = True      # блоки «по заказу» convert пропускает — их не проверяем
+    skip = 0
+    in_table = False
+    header: List[str] = []
+    prev_vals: List[str] = []
+    table_rows = 0
+
+    def close_table(row: int):
+        if checked and not table_rows:
+            _add(report, "warnings", f"Блок «{device}» без строк таблицы", sheet, row)
+
+    # те же строки, что видит разбор: только строки из XML листа, без миллиона пустых;
+    # типы ячеек проверкам не нужны — берём текст как есть, это быстрее самого разбора
+    for row, vals in excel2json._iter_rows(ws, typed=False):
+        if len(report["errors"]) >= MAX_ERRORS:
+            report["truncated"] = True
+            break
+        empty = not any(vals)
+
+        if skip:
+            if skip == 1 and checked:
+                header = vals
+                filled = sum(1 for v in vals if v)
+                if filled < MAX_COLS:
+                    _add(report, "errors", f"Шапка таблицы блока «{device}»: заполнено {filled} "
+                                           f"колонок из {MAX_COLS}", sheet, row)
+            skip -= 1
+            continue
+
+        if in_table:
+            if empty:
+                close_table(row)
+                in_table = False
+                continue
+            if not checked:
+                continue
+            if any("зображен" in v for v in vals):
+                _check_images(report, vals, sheet, row)
+                continue
+            filled = [v or p for v, p in zip(vals, prev_vals)]
+            # пропуск в первой строке тянется вниз по всей таблице — сообщаем о нём один раз;
+            # convert примет и пустую ячейку, но в каталоге колонка выйдет пустой
+            gaps = [header[i] or str(i + 1) for i, v in enumerate(filled) if not v]
+            if gaps and not table_rows:
+                _add(report, "warnings", f"Строка таблицы блока «{device}»: пустые колонки "
+                                         f"({', '.join(gaps)}), заполнить их из строки выше нечем",
+                     sheet, row)
+            prev_vals = filled
+            table_rows += 1
+            continue
+
+        if empty:
+            continue
+        if not vals[0]:
+            _add(report, "warnings", "Строка вне блока (пустая первая колонка) будет пропущена", sheet, row)
+            continue
+        if "зображен" in vals[0]:
+            _add(report, "errors", "Строка картинок отделена от таблицы пустой строкой "
+                                   "и станет отдельным блоком", sheet, row)
+        device, device_row = vals[0], row
+        checked = "по заказу" not in device
+        if checked:
+            blocks += 1
+        skip = 2
+        in_table = True
+        header = []
+        prev_vals = [""] * MAX_COLS
+        table_rows = 0
+
+    if skip and checked:
+        _add(report, "errors", f"Блок «{device}» обрывается: нет описания или шапки таблицы",
+             sheet, device_row)
+    elif in_table:
+        close_table(None)
+    return blocks
+
+
+def check_upload(source: Union[str, Path, BinaryIO], filename: str, size: Optional[int] = None) -> Report:
+    """
+    Проверяет книгу (путь или открытый файл). filename — имя, с которым её загрузили.
+    Возвращает {"valid", "errors", "warnings"}; записи — {"sheet", "row", "message"}.
+    Предупреждения (нет картинки, строка вне блока, пустые колонки) в очередь пропускают, ошибки — нет.
+    """
+    report: Report = {"valid": False, "errors": [], "warnings": []}
+    if Path(filename).suffix.lower() not in ALLOWED_SUFFIXES:
+        _add(report, "errors", f"Нужна книга Excel ({', '.join(ALLOWED_SUFFIXES)}), загружен «{filename}»")
+        return report
+    if size is None and isinstance(source, (str, Path)):
+        size = Path(source).stat().st_size
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        _add(report, "errors", f"Файл {size} байт, допустимо не больше {MAX_UPLOAD_BYTES}")
+        return report
+    if not zipfile.is_zipfile(source):
+        _add(report, "errors", "Файл не является книгой Excel (.xlsx — это zip-архив)")
+        return report
+    if not isinstance(source, (str, Path)):
+        source.seek(0)  # is_zipfile дочитал файл до конца
+
+    try:
+        wb = load_workbook(filename=source, read_only=True, data_only=True)
+    except Exception as e:
+        _add(report, "errors", f"Книга не открывается: {e}")
+        return report
+    try:
+        blocks = sum(_check_sheet(ws, report) for ws in wb.worksheets)
+    finally:
+        wb.close()
+    if not blocks and not report.get("truncated"):
+        _add(report, "errors", "В книге не найдено ни одного блока прибора")
+    more = report.pop("_more_warnings", 0)
+    if more:
+        report["warnings"].append({"sheet": None, "row": None, "message": f"…и ещё {more} предупреждений"})
+    report["valid"] = not report["errors"]
+    return report
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Использование: python upload_check.py книга.xlsx")
+        sys.exit(1)
+    report = check_upload(sys.argv[1], sys.argv[1])
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(0 if report["valid"] else 1)
+
+
+if __name__ == "__main__":
+    main()